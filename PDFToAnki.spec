@@ -3,7 +3,7 @@ from PyInstaller.utils.hooks import collect_all
 
 datas = [('C:\\Users\\socce\\Documents\\#Spring 25\\pdf2anki\\.env.example', '.env.example')]
 binaries = []
-hiddenimports = ['en_core_web_sm', 'customtkinter', 'tkinter', 'PIL']
+hiddenimports = ['customtkinter', 'tkinter', 'PIL']
 tmp_ret = collect_all('customtkinter')
 datas += tmp_ret[0]; binaries += tmp_ret[1]; hiddenimports += tmp_ret[2]
 
@@ -1,5 +1,8 @@
+import asyncio
+import functools
 import genanki
-import random
+import re
+import zlib
 from typing import List, Tuple, Optional
 import logging
 
@@ -7,81 +10,93 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Matches a well-formed cloze deletion such as {{c1::answer}}
+_CLOZE_RE = re.compile(r'\{\{c\d+::[^}]+\}\}')
+
+def _stable_id(name: str) -> int:
+    """Derive a deterministic 31-bit Anki ID from a name."""
+    return (zlib.crc32(name.encode('utf-8')) & 0x7FFFFFFF) | (1 << 30)
+
+# Model IDs derived from the note type names, so every generated deck shares
+# the same Anki note types without reusing IDs other generators use
+BASIC_MODEL_ID = _stable_id('PDFToAnki Basic')
+CLOZE_MODEL_ID = _stable_id('PDFToAnki Cloze')
+
+# Default basic model
+_BASIC_MODEL = genanki.Model(
+    model_id=BASIC_MODEL_ID,
+    name='PDFToAnki Basic',
+    fields=[
+        {'name': 'Question'},
+        {'name': 'Answer'},
+        {'name': 'Source'}  # To track which PDF the card came from
+    ],
+    templates=[{
+        'name': 'Card 1',
+        'qfmt': '{{Question}}<br><br><div class="source"><em>Source: {{Source}}</em></div>',
+        'afmt': '''{{FrontSide}}
+                <hr id="answer">
+                {{Answer}}'''
+    }],
+    css='''
+        .card {
+            font-family: Arial, sans-serif;
+            font-size: 16px;
+            text-align: left;
+            color: black;
+            background-color: white;
+            padding: 20px;
+        }
+        .source {
+            font-size: 12px;
+            color: #666;
+        }
+    '''
+)
+
+# Cloze deletion model
+_CLOZE_MODEL = genanki.Model(
+    model_id=CLOZE_MODEL_ID,
+    name='PDFToAnki Cloze',
+    model_type=genanki.Model.CLOZE,
+    fields=[
+        {'name': 'Text'},
+        {'name': 'Back Extra'},
+        {'name': 'Source'}
+    ],
+    templates=[{
+        'name': 'Cloze',
+        'qfmt': '{{cloze:Text}}<br><br><div class="source"><em>Source: {{Source}}</em></div>',
+        'afmt': '''{{cloze:Text}}<br>
+                <hr id="answer">
+                {{Back Extra}}<br><br>
+                <div class="source"><em>Source: {{Source}}</em></div>'''
+    }],
+    css='''
+        .card {
+            font-family: Arial, sans-serif;
+            font-size: 16px;
+            text-align: left;
+            color: black;
+            background-color: white;
+            padding: 20px;
+        }
+        .cloze {
+            font-weight: bold;
+            color: blue;
+        }
+        .source {
+            font-size: 12px;
+            color: #666;
+        }
+    '''
+)
+
 class AnkiDeckGenerator:
     def __init__(self):
-        """Initialize the Anki deck generator with default model."""
-        # Create a unique model ID
-        self.model_id = random.randrange(1 << 30, 1 << 31)
-        
-        # Default basic model
-        self.basic_model = genanki.Model(
-            model_id=self.model_id,
-            name='PDFToAnki Basic',
-            fields=[
-                {'name': 'Question'},
-                {'name': 'Answer'},
-                {'name': 'Source'}  # To track which PDF the card came from
-            ],
-            templates=[{
-                'name': 'Card 1',
-                'qfmt': '{{Question}}<br><br><div class="source"><em>Source: {{Source}}</em></div>',
-                'afmt': '''{{FrontSide}}
-                        <hr id="answer">
-                        {{Answer}}'''
-            }],
-            css='''
-                .card {
-                    font-family: Arial, sans-serif;
-                    font-size: 16px;
-                    text-align: left;
-                    color: black;
-                    background-color: white;
-                    padding: 20px;
-                }
-                .source {
-                    font-size: 12px;
-                    color: #666;
-                }
-            '''
-        )
-        
-        # Cloze deletion model
-        self.cloze_model = genanki.Model(
-            model_id=self.model_id + 1,
-            name='PDFToAnki Cloze',
-            model_type=genanki.Model.CLOZE,
-            fields=[
-                {'name': 'Text'},
-                {'name': 'Back Extra'},
-                {'name': 'Source'}
-            ],
-            templates=[{
-                'name': 'Cloze',
-                'qfmt': '{{cloze:Text}}<br><br><div class="source"><em>Source: {{Source}}</em></div>',
-                'afmt': '''{{cloze:Text}}<br>
-                        <hr id="answer">
-                        {{Back Extra}}<br><br>
-                        <div class="source"><em>Source: {{Source}}</em></div>'''
-            }],
-            css='''
-                .card {
-                    font-family: Arial, sans-serif;
-                    font-size: 16px;
-                    text-align: left;
-                    color: black;
-                    background-color: white;
-                    padding: 20px;
-                }
-                .cloze {
-                    font-weight: bold;
-                    color: blue;
-                }
-                .source {
-                    font-size: 12px;
-                    color: #666;
-                }
-            '''
-        )
+        """Initialize the Anki deck generator with the shared note models."""
+        self.basic_model = _BASIC_MODEL
+        self.cloze_model = _CLOZE_MODEL
 
     def create_deck(self, qa_pairs: List[Tuple[str, str]], deck_name: str, source: str = "Unknown") -> Optional[str]:
         """
@@ -100,17 +115,16 @@ class AnkiDeckGenerator:
                 logger.warning("No Q&A pairs provided")
                 return None
                 
-            # Create a unique deck ID
-            deck_id = random.randrange(1 << 30, 1 << 31)
-            deck = genanki.Deck(deck_id=deck_id, name=deck_name)
+            # Derive the deck ID from its name so re-imports update the same deck
+            deck = genanki.Deck(deck_id=_stable_id(deck_name), name=deck_name)
             
-            # Add notes to deck
-            for question, answer in qa_pairs:
-                note = genanki.Note(
-                    model=self.basic_model,
-                    fields=[question, answer, source]
-                )
-                deck.add_note(note)
+            # Build all notes in one pass and add them in bulk
+            Note = genanki.Note
+            model = self.basic_model
+            deck.notes.extend([
+                Note(model=model, fields=[question, answer, source])
+                for question, answer in qa_pairs
+            ])
             
             # Generate package
             output_file = f"{deck_name}.apkg"
@@ -141,20 +155,25 @@ class AnkiDeckGenerator:
                 logger.warning("No cloze items provided")
                 return None
                 
-            deck_id = random.randrange(1 << 30, 1 << 31)
-            deck = genanki.Deck(deck_id=deck_id, name=f"{deck_name} (Cloze)")
+            cloze_deck_name = f"{deck_name} (Cloze)"
+            deck = genanki.Deck(deck_id=_stable_id(cloze_deck_name), name=cloze_deck_name)
+            
+            # Verify cloze deletion syntax up front so note building stays branch-free
+            search = _CLOZE_RE.search
+            valid_items = [
+                (text, back_extra) for text, back_extra in cloze_items
+                if search(text)
+            ]
+            skipped = len(cloze_items) - len(valid_items)
+            if skipped:
+                logger.warning(f"Skipping {skipped} invalid cloze item(s)")
             
-            for text, back_extra in cloze_items:
-                # Verify cloze deletion syntax
-                if '{{c' not in text or '::' not in text or '}}' not in text:
-                    logger.warning(f"Skipping invalid cloze item: {text[:50]}...")
-                    continue
-                    
-                note = genanki.Note(
-                    model=self.cloze_model,
-                    fields=[text, back_extra, source]
-                )
-                deck.add_note(note)
+            Note = genanki.Note
+            model = self.cloze_model
+            deck.notes.extend([
+                Note(model=model, fields=[text, back_extra, source])
+                for text, back_extra in valid_items
+            ])
             
             if not deck.notes:
                 logger.warning("No valid cloze cards were created")
@@ -169,4 +188,32 @@ class AnkiDeckGenerator:
             
         except Exception as e:
             logger.error(f"Error creating cloze Anki deck: {e}")
-            return None 
\ No newline at end of file
+            return None 
+
+    async def acreate_deck(self, qa_pairs: List[Tuple[str, str]], deck_name: str, source: str = "Unknown") -> Optional[str]:
+        """
+        Async version of create_deck.
+        
+        Building the notes and writing the .apkg (SQLite inserts plus zip
+        compression) run on the loop's default executor so the caller's
+        event loop stays responsive.
+        
+        Returns:
+            str: Path to the generated .apkg file, or None if creation fails
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.create_deck, qa_pairs, deck_name, source)
+        )
+
+    async def acreate_cloze_deck(self, cloze_items: List[Tuple[str, str]], deck_name: str, source: str = "Unknown") -> Optional[str]:
+        """
+        Async version of create_cloze_deck, writing the package on the loop's default executor.
+        
+        Returns:
+            str: Path to the generated .apkg file, or None if creation fails
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.create_cloze_deck, cloze_items, deck_name, source)
+        )
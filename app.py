@@ -1,14 +1,21 @@
+import asyncio
 import customtkinter as ctk
+import functools
 import tkinter as tk
 from tkinter import filedialog, messagebox
+import hashlib
 import os
 from pdf_processor import PDFProcessor
 from anki_generator import AnkiDeckGenerator
 from llm_processor import LLMProcessor
+from extraction_profiles import ExtractionProfile
 from typing import Optional
 import logging
+import multiprocessing
 import sys
+import threading
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 # Configure logging to write to both file and console
@@ -23,6 +30,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Extracted text is inserted into the preview in blocks of this many characters
+PREVIEW_BLOCK_SIZE = 64 * 1024
+
+# Profile menu entry that leaves the parser choice to the PDFPlumber checkbox
+MANUAL_PROFILE = "Manual"
+
 class PDFToAnkiApp:
     def __init__(self):
         """Initialize the PDFToAnki application."""
@@ -37,10 +50,24 @@ class PDFToAnkiApp:
         
         # Track current state
         self.current_pdf: Optional[str] = None
+        self._total_pages: Optional[int] = None
         self.output_path: str = os.path.expanduser("~")
         self.extracted_text: str = ""
+        self._text_hash: Optional[str] = None
+        
+        # Background workers so deck building doesn't block the Tk mainloop
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self._deck_futures: Optional[dict] = None
+        # Set when the window closes so Batch API polling stops instead of
+        # keeping the process alive until the job finishes
+        self._cancel_event = threading.Event()
+        
+        # Event loop on a daemon thread so LLM network I/O never blocks the GUI
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, daemon=True).start()
         
         self._create_gui()
+        self.window.protocol("WM_DELETE_WINDOW", self._on_close)
         
     def _create_gui(self):
         """Create the GUI elements."""
@@ -102,10 +129,22 @@ class PDFToAnkiApp:
         self.use_plumber_cb = ctk.CTkCheckBox(
             self.pdf_options_frame,
             text="Use PDFPlumber",
-            variable=self.use_plumber_var
+            variable=self.use_plumber_var,
+            # Choosing a parser by hand overrides the extraction profile
+            command=lambda: self.profile_var.set(MANUAL_PROFILE)
         )
         self.use_plumber_cb.pack(side=tk.LEFT, padx=5)
         
+        # Extraction profile (Auto detects one from the document)
+        self.profile_var = tk.StringVar(value=ExtractionProfile.AUTO.value)
+        self.profile_menu = ctk.CTkOptionMenu(
+            self.pdf_options_frame,
+            values=[profile.value for profile in ExtractionProfile] + [MANUAL_PROFILE],
+            variable=self.profile_var,
+            width=120
+        )
+        self.profile_menu.pack(side=tk.LEFT, padx=5)
+        
         self.process_pdf_btn = ctk.CTkButton(
             self.pdf_options_frame,
             text="Process PDF",
@@ -205,6 +244,24 @@ class PDFToAnkiApp:
         )
         self.create_cloze_cb.pack(side=tk.LEFT, padx=5)
         
+        # Batch API Option (large texts only)
+        self.use_batch_api_var = tk.BooleanVar(value=False)
+        self.use_batch_api_cb = ctk.CTkCheckBox(
+            self.deck_options_frame,
+            text="Use Batch API (cheaper, slower)",
+            variable=self.use_batch_api_var
+        )
+        self.use_batch_api_cb.pack(side=tk.LEFT, padx=5)
+        
+        # Regenerate Option (skip cached cards for the same prompt and text)
+        self.regenerate_var = tk.BooleanVar(value=False)
+        self.regenerate_cb = ctk.CTkCheckBox(
+            self.deck_options_frame,
+            text="Regenerate (ignore cache)",
+            variable=self.regenerate_var
+        )
+        self.regenerate_cb.pack(side=tk.LEFT, padx=5)
+        
         # Progress and status
         self.status_label = ctk.CTkLabel(self.right_column, text="")
         self.status_label.pack(fill=tk.X, padx=5, pady=2)
@@ -238,12 +295,16 @@ class PDFToAnkiApp:
             filetypes=[("PDF files", "*.pdf")]
         )
         if filename:
+            # Release the memory map of the previously selected PDF
+            self.pdf_processor.close()
+            self._total_pages = None
             self.current_pdf = filename
             self.file_path.delete(0, tk.END)
             self.file_path.insert(0, filename)
             
-            # Update total pages
+            # Update total pages (cached for _process_pdf)
             total_pages = self.pdf_processor.get_page_count(filename)
+            self._total_pages = total_pages
             if total_pages > 0:
                 self.total_pages_label.configure(text=f"(Total: {total_pages})")
                 # Set default end page to total pages
@@ -277,7 +338,8 @@ class PDFToAnkiApp:
         
     def _on_model_change(self, choice):
         """Handle model selection change."""
-        self.llm_processor = LLMProcessor(model=choice)
+        # Share the open cache rather than opening another connection to it
+        self.llm_processor = LLMProcessor(model=choice, cache=self.llm_processor.cache)
         # Keep current prompt type when changing model
         current_prompt_type = self.prompt_type_var.get()
         template = self.llm_processor.get_prompt_template(current_prompt_type)
@@ -289,7 +351,7 @@ class PDFToAnkiApp:
         self.status_label.configure(text=message)
         if progress is not None:
             self.progress_bar.set(progress)
-        self.window.update()
+        self.window.update_idletasks()
         
     def _process_pdf(self):
         """Process the selected PDF file."""
@@ -317,7 +379,9 @@ class PDFToAnkiApp:
             if end_text:
                 try:
                     end_page = int(end_text)
-                    total_pages = self.pdf_processor.get_page_count(self.current_pdf)
+                    if self._total_pages is None:
+                        self._total_pages = self.pdf_processor.get_page_count(self.current_pdf)
+                    total_pages = self._total_pages
                     if end_page > total_pages:
                         raise ValueError(f"End page cannot exceed total pages ({total_pages})")
                 except ValueError as e:
@@ -327,50 +391,66 @@ class PDFToAnkiApp:
             # Disable the process button while working
             self.process_pdf_btn.configure(state="disabled")
             self._update_status("Starting PDF processing...", 0.1)
-            self.window.update()
             
             # Clear previous text
             self.text_preview.delete("1.0", tk.END)
             self.extracted_text = ""
+            self._text_hash = None
             
             logger.info(f"Processing PDF: {self.current_pdf} (pages {start_page or 1} to {end_page or 'end'})")
             self._update_status("Extracting text from PDF...", 0.3)
-            self.window.update()
             
             # Extract text with progress updates
-            if self.use_plumber_var.get():
+            profile_name = self.profile_var.get()
+            profile = None if profile_name == MANUAL_PROFILE else ExtractionProfile(profile_name)
+            if profile is not None:
+                self._update_status(f"Extracting text ({profile_name} profile)...", 0.4)
+            elif self.use_plumber_var.get():
                 logger.info("Using PDFPlumber for extraction")
                 self._update_status("Extracting text with PDFPlumber...", 0.4)
             else:
-                logger.info("Using PyPDF2 for extraction")
-                self._update_status("Extracting text with PyPDF2...", 0.4)
-            
-            self.window.update()
-            
-            # Extract text
-            self.extracted_text = self.pdf_processor.extract_text(
+                logger.info("Using PDFium for extraction")
+                self._update_status("Extracting text with PDFium...", 0.4)
+            
+            # Extract text page by page in a single pass: each page is encoded
+            # once, hashed for the LLM cache key and appended to the text buffer,
+            # and flushed to the preview in large blocks so the textbox is
+            # relaid out once per block rather than per page
+            hasher = hashlib.sha256()
+            buffer = bytearray()
+            pending = []
+            pending_size = 0
+            separator = ""
+            for page_text in self.pdf_processor.iter_text(
                 self.current_pdf,
                 use_plumber=self.use_plumber_var.get(),
                 start_page=start_page,
-                end_page=end_page
-            )
+                end_page=end_page,
+                profile=profile
+            ):
+                chunk = separator + page_text
+                separator = "\n"
+                chunk_bytes = chunk.encode("utf-8")
+                buffer += chunk_bytes
+                hasher.update(chunk_bytes)
+                pending.append(chunk)
+                pending_size += len(chunk)
+                if pending_size >= PREVIEW_BLOCK_SIZE:
+                    self.text_preview.insert(tk.END, "".join(pending))
+                    self.window.update_idletasks()
+                    pending = []
+                    pending_size = 0
+            if pending:
+                self.text_preview.insert(tk.END, "".join(pending))
+            self.window.update_idletasks()
+            self.extracted_text = buffer.decode("utf-8")
+            self._text_hash = hasher.hexdigest()
             
             # Log the result
             if self.extracted_text:
                 text_length = len(self.extracted_text)
                 logger.info(f"Successfully extracted {text_length} characters")
                 
-                # Update preview with chunks to handle large texts
-                self._update_status("Updating preview...", 0.7)
-                self.window.update()
-                
-                # Insert text in chunks to handle large documents
-                chunk_size = 1000
-                for i in range(0, len(self.extracted_text), chunk_size):
-                    chunk = self.extracted_text[i:i + chunk_size]
-                    self.text_preview.insert(tk.END, chunk)
-                    self.window.update()
-                
                 page_range_text = f" (pages {start_page or 1} to {end_page or 'end'})"
                 self._update_status(f"PDF processed successfully! ({text_length} characters extracted){page_range_text}", 1.0)
             else:
@@ -386,7 +466,6 @@ class PDFToAnkiApp:
         finally:
             # Re-enable the process button
             self.process_pdf_btn.configure(state="normal")
-            self.window.update()
     
     def _generate_deck(self):
         """Generate Anki deck from the current text."""
@@ -405,13 +484,6 @@ class PDFToAnkiApp:
             if not custom_prompt:
                 custom_prompt = None
             
-            # Generate Q&A pairs
-            qa_pairs = self.llm_processor.process_text(text, custom_prompt)
-            
-            if not qa_pairs:
-                messagebox.showerror("Error", "No flashcards could be generated.")
-                return
-            
             # Get deck name from input or use default
             deck_name = self.deck_name_entry.get().strip()
             if not deck_name:
@@ -422,24 +494,130 @@ class PDFToAnkiApp:
                 self.deck_name_entry.delete(0, tk.END)
                 self.deck_name_entry.insert(0, deck_name)
             
-            # Create Anki deck
-            self._update_status("Creating Anki deck...", 0.7)
-            output_file = self.anki_generator.create_deck(
-                qa_pairs,
-                deck_name,
-                source=deck_name  # Use deck name as source for better organization
+            # Generate Q&A pairs without blocking the GUI
+            self.generate_btn.configure(state="disabled")
+            self.llm_processor.regenerate = self.regenerate_var.get()
+            # Reuse the hash computed during extraction for the cache lookup
+            text_hash = self._text_hash if self.extracted_text else None
+            future = asyncio.run_coroutine_threadsafe(
+                self._agenerate_qa(text, custom_prompt, text_hash, self.use_batch_api_var.get()),
+                self.loop
+            )
+            future.add_done_callback(
+                lambda f: self.window.after(0, self._on_qa_ready, f, text, deck_name)
             )
             
-            # Create cloze cards if requested
-            if self.create_cloze_var.get():
-                self._update_status("Creating cloze cards...", 0.9)
-                cloze_items = self.llm_processor.create_cloze_deletions(text)
-                if cloze_items:
-                    self.anki_generator.create_cloze_deck(
-                        cloze_items,
+        except Exception as e:
+            logger.error(f"Error generating deck: {e}")
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            self._update_status("Error occurred", 0)
+            self.generate_btn.configure(state="normal")
+            
+    async def _agenerate_qa(self, text: str, custom_prompt: Optional[str], text_hash: Optional[str],
+                            use_batch_api: bool) -> list:
+        """
+        Split the text into token windows and generate Q&A pairs (runs on the event loop).
+        
+        The split runs on an executor thread: the first call loads tiktoken,
+        which may download its vocabulary, and every call encodes the whole text.
+        """
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(self.executor, self.llm_processor.split_text_tokens, text)
+        if len(chunks) == 1:
+            return await self.llm_processor.aprocess_text(text, custom_prompt, text_hash)
+        if use_batch_api:
+            self.window.after(0, self._update_status,
+                              f"Submitted {len(chunks)} chunks to the Batch API, waiting for results...", 0.3)
+            return await loop.run_in_executor(self.executor, self._process_chunks_batch, chunks, custom_prompt)
+        self.window.after(0, self._update_status, f"Processing {len(chunks)} chunks with LLM...", 0.3)
+        return await self._aprocess_chunks(chunks, custom_prompt)
+        
+    def _process_chunks_batch(self, chunks: list, custom_prompt: Optional[str]) -> list:
+        """Run chunks through the provider Batch API (runs on a worker thread)."""
+        results = self.llm_processor.process_text_batch(chunks, custom_prompt, cancel_event=self._cancel_event)
+        return [pair for pairs in results for pair in pairs]
+        
+    async def _aprocess_chunks(self, chunks: list, custom_prompt: Optional[str]) -> list:
+        """Run chunks through concurrent realtime requests (runs on the event loop)."""
+        results = await self.llm_processor.aprocess_text_batch(chunks, custom_prompt)
+        return [pair for pairs in results for pair in pairs]
+        
+    def _on_qa_ready(self, future, text: str, deck_name: str):
+        """Create the deck(s) once the LLM has returned Q&A pairs."""
+        try:
+            qa_pairs = future.result()
+            
+            if not qa_pairs:
+                messagebox.showerror("Error", "No flashcards could be generated.")
+                self.generate_btn.configure(state="normal")
+                return
+            
+            # Create Anki deck (and cloze cards if requested) concurrently off the Tk thread;
+            # the basic deck's package is written on the event loop's executor
+            self._update_status("Creating Anki deck...", 0.7)
+            futures = {
+                "basic": asyncio.run_coroutine_threadsafe(
+                    self.anki_generator.acreate_deck(
+                        qa_pairs,
                         deck_name,
                         source=deck_name  # Use deck name as source for better organization
-                    )
+                    ),
+                    self.loop
+                )
+            }
+            if self.create_cloze_var.get():
+                futures["cloze"] = asyncio.run_coroutine_threadsafe(
+                    self._abuild_cloze_deck(text, deck_name, self.use_batch_api_var.get()),
+                    self.loop
+                )
+            
+            self._deck_futures = futures
+            for deck_future in futures.values():
+                # Marshal completion back onto the Tk thread
+                deck_future.add_done_callback(
+                    lambda _: self.window.after(0, self._on_deck_futures_done, futures)
+                )
+            
+        except Exception as e:
+            logger.error(f"Error generating deck: {e}")
+            messagebox.showerror("Error", f"An error occurred: {str(e)}")
+            self._update_status("Error occurred", 0)
+            self.generate_btn.configure(state="normal")
+            
+    async def _abuild_cloze_deck(self, text: str, deck_name: str, use_batch_api: bool) -> Optional[str]:
+        """Generate cloze items chunk by chunk and write the cloze deck (runs on the event loop)."""
+        self.window.after(0, self._update_status, "Creating cloze cards...", 0.9)
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor(self.executor, self.llm_processor.split_text_tokens, text)
+        if use_batch_api and len(chunks) > 1:
+            self.window.after(0, self._update_status,
+                              f"Submitted {len(chunks)} chunks to the Batch API for cloze cards, waiting for results...", 0.9)
+            results = await loop.run_in_executor(self.executor, functools.partial(
+                self.llm_processor.process_text_bulk, chunks, "batch",
+                card_type="cloze", cancel_event=self._cancel_event
+            ))
+        else:
+            results = await self.llm_processor.acreate_cloze_deletions_batch(chunks)
+        cloze_items = [item for items in results for item in items]
+        if not cloze_items:
+            return None
+        return await self.anki_generator.acreate_cloze_deck(
+            cloze_items,
+            deck_name,
+            source=deck_name  # Use deck name as source for better organization
+        )
+        
+    def _on_deck_futures_done(self, futures: dict):
+        """Report the result once every deck-building future has finished."""
+        if futures is not self._deck_futures or not all(f.done() for f in futures.values()):
+            return
+        self._deck_futures = None
+        self.generate_btn.configure(state="normal")
+        
+        try:
+            output_file = futures["basic"].result()
+            if "cloze" in futures:
+                futures["cloze"].result()
             
             self._update_status("Done!", 1.0)
             messagebox.showinfo(
@@ -459,31 +637,23 @@ class PDFToAnkiApp:
             return
             
         try:
-            # Get the current prompt text
+            # Read the prompt once and do all string work in Python
             prompt_text = self.prompt_text.get("1.0", tk.END)
             
-            # Find the position of "Text:" in the prompt
+            # Keep everything up to and including "Text:", appending the marker if missing
             text_marker = "Text:"
             text_pos = prompt_text.find(text_marker)
-            
             if text_pos == -1:
-                # If "Text:" not found, append it
-                self.prompt_text.delete("1.0", tk.END)
-                self.prompt_text.insert("1.0", prompt_text.strip() + "\n\nText:\n")
-                text_pos = self.prompt_text.get("1.0", tk.END).find(text_marker)
+                prefix = prompt_text.strip() + "\n\n" + text_marker
+            else:
+                prefix = prompt_text[:text_pos + len(text_marker)]
             
             # Get the text to insert
             text_to_insert = self.extracted_text if self.extracted_text else self.text_preview.get("1.0", tk.END).strip()
             
-            # Find the position after "Text:"
-            prompt_content = self.prompt_text.get("1.0", tk.END)
-            insert_pos = text_pos + len(text_marker)
-            
-            # Delete any existing text after "Text:"
-            self.prompt_text.delete(f"1.0 + {insert_pos}c", tk.END)
-            
-            # Insert the new text with proper formatting
-            self.prompt_text.insert(tk.END, f"\n{text_to_insert}")
+            # Replace the prompt contents in a single write
+            self.prompt_text.delete("1.0", tk.END)
+            self.prompt_text.insert("1.0", f"{prefix}\n{text_to_insert}")
             
             # Show success message
             self.status_label.configure(text="Text inserted into prompt")
@@ -492,6 +662,17 @@ class PDFToAnkiApp:
             logger.error(f"Error inserting text into prompt: {e}")
             messagebox.showerror("Error", f"Failed to insert text: {str(e)}")
             
+    def _on_close(self):
+        """
+        Stop waiting for Batch API jobs and close the window.
+        
+        The jobs keep running at the provider; their IDs are cached, so
+        generating the same deck again resumes them.
+        """
+        self._cancel_event.set()
+        self.executor.shutdown(wait=False)
+        self.window.destroy()
+        
     def run(self):
         """Start the application."""
         self.window.mainloop()
@@ -513,4 +694,6 @@ def main():
             raise
 
 if __name__ == "__main__":
+    # Required for process-pool extraction in the frozen Windows executable
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -1,23 +1,20 @@
 import PyInstaller.__main__
 import os
-import sys
-import subprocess
-import site
 from pathlib import Path
 
+# Directory of this script, resolved once
+SCRIPT_DIR = Path(__file__).resolve().parent
+
 def build_exe():
-    # Get the directory of this script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    
     # Path to your main script
-    main_script = os.path.join(script_dir, 'app.py')
+    main_script = SCRIPT_DIR / 'app.py'
     
     # Path to your .env.example
-    env_example = os.path.join(script_dir, '.env.example')
+    env_example = SCRIPT_DIR / '.env.example'
     
     # Base command arguments
     args = [
-        main_script,
+        str(main_script),
         '--name=PDFToAnki',
         '--onefile',
         # '--windowed',  # Removed windowed mode to show console
@@ -32,12 +29,12 @@ def build_exe():
     ]
     
     # Add icon if it exists
-    icon_path = os.path.join(script_dir, 'resources', 'icon.ico')
-    if os.path.exists(icon_path):
-        args.extend(['--icon', icon_path])
+    icon_path = SCRIPT_DIR / 'resources' / 'icon.ico'
+    if icon_path.exists():
+        args.extend(['--icon', str(icon_path)])
     
     # Build the executable
     PyInstaller.__main__.run(args)
 
 if __name__ == '__main__':
-    build_exe() 
\ No newline at end of file
+    build_exe()
@@ -0,0 +1,108 @@
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Sequence
+import re
+import statistics
+
+# Documents whose sampled pages have a median text length below this are
+# treated as scanned (image-only)
+SCANNED_TEXT_CHARS = 20
+
+# Pages sampled (spread over the document) when detecting a profile
+SAMPLE_PAGES = 5
+
+class ExtractionProfile(Enum):
+    """Kinds of document that benefit from different extraction settings."""
+    AUTO = "Auto"
+    ACADEMIC = "Academic"
+    POLICY = "Policy"
+    GOVERNMENT = "Government"
+    FORM = "Form"
+    SCANNED_OCR = "Scanned/OCR"
+    MIXED = "Mixed"
+
+@dataclass(frozen=True)
+class ProfileSettings:
+    """
+    Extraction settings for a document profile.
+
+    Attributes:
+        use_plumber: Whether to extract with pdfplumber instead of PDFium
+        x_tolerance: Horizontal gap (in points) pdfplumber treats as a word boundary
+        use_layout_mode: Whether pdfplumber should preserve the page layout
+    """
+    use_plumber: bool
+    x_tolerance: float = 3.0
+    use_layout_mode: bool = False
+
+    def plumber_kwargs(self) -> Dict[str, object]:
+        """Keyword arguments for pdfplumber's Page.extract_text."""
+        return {"x_tolerance": self.x_tolerance, "layout": self.use_layout_mode}
+
+PROFILE_SETTINGS: Dict[ExtractionProfile, ProfileSettings] = {
+    # Single-column prose: PDFium's fast path is good enough
+    ExtractionProfile.ACADEMIC: ProfileSettings(use_plumber=False),
+    ExtractionProfile.POLICY: ProfileSettings(use_plumber=False),
+    # Tightly set text where words run together at the default tolerance
+    ExtractionProfile.GOVERNMENT: ProfileSettings(use_plumber=True, x_tolerance=1.5),
+    # Field labels and values sit close together; pdfplumber keeps them apart.
+    # Layout mode is left off since its padding is all billed as tokens
+    ExtractionProfile.FORM: ProfileSettings(use_plumber=True),
+    # Neither backend can OCR, so take whatever text layer there is the fast way
+    ExtractionProfile.SCANNED_OCR: ProfileSettings(use_plumber=False),
+    # Unknown or mixed content: start with the fast path
+    ExtractionProfile.MIXED: ProfileSettings(use_plumber=False),
+}
+
+# Filename words hinting at a document type, checked in order
+_FILENAME_HINTS = [
+    (ExtractionProfile.ACADEMIC, {"arxiv", "paper", "journal", "thesis", "proceedings"}),
+    (ExtractionProfile.POLICY, {"policy", "policies", "handbook", "guidelines"}),
+    (ExtractionProfile.GOVERNMENT, {"gov", "government", "regulation", "regulations", "statute", "federal"}),
+    (ExtractionProfile.FORM, {"form", "forms", "application", "worksheet"}),
+]
+
+def sample_page_indices(page_count: int, samples: int = SAMPLE_PAGES) -> List[int]:
+    """
+    Pick up to samples page indices spread evenly over a document.
+
+    Args:
+        page_count: Number of pages in the document
+        samples: Maximum number of pages to pick
+
+    Returns:
+        Sorted 0-based page indices, including the first and last page
+    """
+    if page_count <= samples:
+        return list(range(page_count))
+    step = (page_count - 1) / (samples - 1)
+    return sorted({round(i * step) for i in range(samples)})
+
+def detect_profile(pdf_path: str, page_texts: Sequence[str], has_form: bool = False) -> ExtractionProfile:
+    """
+    Guess a document profile from cheap signals.
+
+    Looks at form fields and the sampled pages' text before falling back to
+    keywords in the filename. A document only counts as scanned when the
+    median sampled page has almost no text, so a short cover or title page
+    does not decide it.
+
+    Args:
+        pdf_path: Path to PDF file
+        page_texts: Text extracted from a sample of pages (see sample_page_indices)
+        has_form: Whether the document has interactive form fields
+
+    Returns:
+        The detected profile (never AUTO)
+    """
+    if has_form:
+        return ExtractionProfile.FORM
+    if statistics.median([len(text.strip()) for text in page_texts] or [0]) < SCANNED_TEXT_CHARS:
+        return ExtractionProfile.SCANNED_OCR
+
+    words = set(re.split(r'[^a-z0-9]+', Path(pdf_path).stem.lower()))
+    for profile, keywords in _FILENAME_HINTS:
+        if words & keywords:
+            return profile
+    return ExtractionProfile.MIXED
@@ -1,15 +1,220 @@
-from typing import List, Tuple, Optional, Dict
+from typing import Callable, List, Tuple, Optional, Dict
+import asyncio
+import functools
+import hashlib
+import json
 import logging
-from utils.llm_utils import get_llm_completion
+import threading
+from utils.llm_utils import (
+    get_llm_completion,
+    aget_llm_completion,
+    get_llm_batch_completion,
+    supports_batch_api,
+)
+from utils.llm_cache import LLMCache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Texts longer than this are split into chunks before being sent to the LLM
+CHUNK_CHARS = 12000
+
+# Token-based chunking: chunk size, and overlap so cards spanning a boundary survive
+CHUNK_TOKENS = 3000
+CHUNK_OVERLAP_TOKENS = 100
+
+# Rough characters per token, used when tiktoken is unavailable
+CHARS_PER_TOKEN = 4
+
+# Stands in for {text} while a template is split into its system and user parts
+_TEXT_PLACEHOLDER = "\x00text\x00"
+
+def _find_marker(response: str, marker: str, start: int, end: int) -> int:
+    """
+    Find the next marker in response[start:end] that begins a line, allowing
+    leading spaces or tabs.
+    
+    Returns:
+        Index of the marker, or -1 if there is none
+    """
+    i = response.find(marker, start, end)
+    while i >= 0:
+        line_start = response.rfind('\n', 0, i) + 1
+        if not response[line_start:i].strip(' \t'):
+            return i
+        i = response.find(marker, i + 1, end)
+    return -1
+
+def make_block_parser(first: str, second: str) -> Callable[[str], List[Tuple[str, str]]]:
+    """
+    Build a parser for completions made of two-marker blocks, such as "Q:"/"A:".
+    
+    A block is a line starting with the first marker, followed on a later
+    line by the second marker, whose text runs until the next line starting
+    with the first marker. Lines between the two markers are skipped, and a
+    first-marker line without its partner (or with empty text) is dropped.
+    
+    The markers and their lengths are bound once here, so each output format
+    gets its own specialised scanner rather than one generic parser.
+    
+    Args:
+        first: Marker opening a block
+        second: Marker opening the block's second field
+        
+    Returns:
+        Function mapping a completion to a list of (first, second) field tuples
+    """
+    first_len = len(first)
+    second_len = len(second)
+    
+    def parse(response: str) -> List[Tuple[str, str]]:
+        pairs: List[Tuple[str, str]] = []
+        size = len(response)
+        pos = _find_marker(response, first, 0, size)
+        while pos >= 0:
+            line_end = response.find('\n', pos)
+            if line_end < 0:
+                break
+            next_pos = _find_marker(response, first, line_end, size)
+            block_end = next_pos if next_pos >= 0 else size
+            second_pos = _find_marker(response, second, line_end, block_end)
+            if second_pos >= 0:
+                head = response[pos + first_len:line_end].strip()
+                if head:
+                    pairs.append((head, response[second_pos + second_len:block_end].strip()))
+            pos = next_pos
+        return pairs
+    
+    return parse
+
+# Parse "Q:"/"A:" blocks into (question, answer) tuples
+parse_qa_response = make_block_parser("Q:", "A:")
+
+# Parse "Text:"/"Extra:" blocks into (cloze_text, back_extra) tuples, before syntax validation
+parse_cloze_response = make_block_parser("Text:", "Extra:")
+
+def validate_cloze_items(cloze_items: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    """
+    Repair single-brace cloze markup and drop items without valid cloze syntax.
+    
+    Args:
+        cloze_items: (cloze_text, back_extra) tuples from parse_cloze_response
+        
+    Returns:
+        The items whose text contains a well-formed {{cN::...}} deletion
+    """
+    validated_items: List[Tuple[str, str]] = []
+    text: str
+    extra: str
+    n_fixed = 0
+    debug = logger.isEnabledFor(logging.DEBUG)
+    
+    for text, extra in cloze_items:
+        # Try to fix single curly brace syntax
+        if '{{' not in text and '{c' in text and '::' in text and '}' in text:
+            text = text.replace('{c', '{{c').replace('}', '}}')
+            n_fixed += 1
+        
+        if '{{c' in text and '::' in text and '}}' in text:
+            validated_items.append((text, extra))
+        elif debug:
+            logger.debug(f"Invalid cloze syntax in: {text[:50]}...")
+    
+    # One summary line instead of a log call per item
+    logger.info(f"Validated {len(validated_items)} cloze cards "
+                f"({n_fixed} autofixed, {len(cloze_items) - len(validated_items)} invalid)")
+    return validated_items
+
+def dedupe_texts(texts: List[str]) -> Tuple[List[str], List[int]]:
+    """
+    Collapse identical texts (repeated headers, footers, boilerplate pages)
+    so each is only sent to the LLM once.
+    
+    Args:
+        texts: Texts to process
+        
+    Returns:
+        Tuple of (unique_texts, index_map) where texts[i] == unique_texts[index_map[i]]
+    """
+    seen: Dict[bytes, int] = {}
+    unique_texts: List[str] = []
+    index_map: List[int] = []
+    for text in texts:
+        digest = hashlib.sha1(text.encode("utf-8")).digest()
+        if digest not in seen:
+            seen[digest] = len(unique_texts)
+            unique_texts.append(text)
+        index_map.append(seen[digest])
+    return unique_texts, index_map
+
+def _expand_results(results: List[List[Tuple[str, str]]], index_map: List[int]) -> List[List[Tuple[str, str]]]:
+    """Map per-unique-text results back onto every original position, as separate lists."""
+    return [list(results[i]) for i in index_map]
+
+def split_prompt(prompt: str, text: str) -> Tuple[str, str]:
+    """
+    Split a prompt template into a constant system prompt and a per-text user message.
+    
+    The instructions before {text} are identical for every chunk, so sending
+    them as the system prompt lets providers cache them as a prompt prefix.
+    A trailing "Text:" label stays with the text it introduces.
+    
+    Args:
+        prompt: Prompt template containing a {text} placeholder
+        text: Text to insert
+        
+    Returns:
+        Tuple of (system_prompt, user_message); system_prompt is empty when
+        the template has nothing before {text}
+    """
+    formatted = prompt.format(text=_TEXT_PLACEHOLDER)
+    if _TEXT_PLACEHOLDER not in formatted:
+        return "", formatted
+    instructions, _, suffix = formatted.partition(_TEXT_PLACEHOLDER)
+    instructions = instructions.strip()
+    label = ""
+    if instructions.endswith("Text:"):
+        instructions = instructions[:-len("Text:")].rstrip()
+        label = "Text:\n"
+    return instructions, f"{label}{text}{suffix.rstrip()}"
+
+@functools.lru_cache(maxsize=None)
+def _load_encoder(model: str):
+    """
+    Load the tiktoken encoding for a model, or None if tiktoken is unavailable.
+    
+    Cached per model for the whole process, so new LLMProcessor instances
+    (and failed loads, e.g. when the encoding files can't be downloaded)
+    are only paid for once.
+    """
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            # Non-OpenAI models: a close enough estimate for chunking
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.info(f"tiktoken unavailable ({e}), chunking by characters")
+        return None
+
 class LLMProcessor:
-    def __init__(self, model: str = "gpt-4o"):
-        """Initialize LLM processor with specified model."""
+    def __init__(self, model: str = "gpt-4o", cache: Optional[LLMCache] = None, max_concurrency: int = 6,
+                 regenerate: bool = False):
+        """
+        Initialize LLM processor with specified model, response cache and request concurrency limit.
+        
+        Completions use the provider's default (non-zero) temperature, so a
+        cached result is one sample of many; with regenerate set, cached
+        cards are ignored and every request is sent again, replacing them.
+        """
         self.model = model
+        self.max_concurrency = max_concurrency
+        self.regenerate = regenerate
+        self._encoder = None
+        self._encoder_model: Optional[str] = None
+        self.cache = cache if cache is not None else LLMCache()
         self._initialize_prompts()
         self.default_prompt = self.prompts["standard"]
 
@@ -111,6 +316,34 @@ class LLMProcessor:
             {text}
             """
         }
+        
+        # Template for cloze deletion cards (literal braces are doubled for str.format)
+        self.default_cloze_prompt = """
+        Create Anki cloze deletion cards from the following text.
+        
+        Guidelines:
+        1. Use EXACTLY this format with DOUBLE curly braces: {{{{c1::text}}}} for the first cloze in each sentence
+        2. Use {{{{c2::text}}}} for the second cloze, {{{{c3::text}}}} for the third, etc.
+        3. Create meaningful deletions that test understanding
+        4. Include helpful extra information after each card
+        5. Format each card exactly as:
+        
+        Text: [Sentence with cloze deletions]
+        Extra: [Additional helpful information]
+        
+        Example:
+        Text: {{{{c1::Python}}}} was created by {{{{c2::Guido van Rossum}}}} in {{{{c3::1991}}}}.
+        Extra: Python is now one of the most popular programming languages.
+        
+        IMPORTANT: 
+        - Use DOUBLE curly braces {{{{ }}}} not single ones {{ }}
+        - Each card MUST have both Text: and Extra: lines
+        - Create at least 3-5 cloze cards from the text
+        - Make sure each cloze deletion tests important concepts
+        
+        Text:
+        {text}
+        """
 
     def get_available_prompt_types(self) -> Dict[str, str]:
         """
@@ -141,74 +374,126 @@ class LLMProcessor:
         """
         return self.prompts.get(prompt_type, self.prompts["standard"])
 
-    def process_text(self, text: str, custom_prompt: Optional[str] = None) -> List[Tuple[str, str]]:
+    def _parse_qa_response(self, success: bool, response: str) -> List[Tuple[str, str]]:
+        """
+        Parse an LLM completion into Q&A pairs.
+        
+        Args:
+            success: Whether the completion call succeeded
+            response: The completion text, or an error message on failure
+            
+        Returns:
+            List of (question, answer) tuples
+        """
+        if not success:
+            logger.error(f"Error getting LLM completion: {response}")
+            return []
+        
+        # Log raw response for debugging
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"Raw LLM response first 500 chars: {response[:500]}")
+        
+        qa_pairs = parse_qa_response(response)
+        logger.info(f"Extracted {len(qa_pairs)} Q&A pairs from a {len(response)} char response")
+        
+        return qa_pairs
+
+    def _get_cached_cards(self, card_type: str, prompt: str, text: str,
+                          text_hash: Optional[str] = None) -> Optional[List[Tuple[str, str]]]:
+        """Return cached cards ("qa" pairs or "cloze" items) for this model, prompt and text, if any."""
+        if self.regenerate:
+            return None
+        cached = self.cache.get(self.model, prompt, text, text_hash, kind=card_type)
+        if cached is None:
+            return None
+        return [(question, answer) for question, answer in cached]
+
+    def _store_cards(self, card_type: str, prompt: str, text: str, cards: List[Tuple[str, str]],
+                     text_hash: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Cache a non-empty card list of the given type and return it unchanged."""
+        if cards:
+            self.cache.set(self.model, prompt, text, cards, text_hash, kind=card_type)
+        return cards
+
+    def process_text(self, text: str, custom_prompt: Optional[str] = None,
+                     text_hash: Optional[str] = None) -> List[Tuple[str, str]]:
         """
         Process text using LLM to generate Q&A pairs.
         
         Args:
             text: Text to process
             custom_prompt: Optional custom prompt template
+            text_hash: Optional precomputed sha256 hex digest of text for the cache key
             
         Returns:
             List of (question, answer) tuples
         """
         try:
+            # Long texts are processed as concurrent chunk requests
+            chunks = self.split_text_tokens(text)
+            if len(chunks) > 1:
+                logger.info(f"Text split into {len(chunks)} chunks")
+                results = asyncio.run(self.aprocess_text_batch(chunks, custom_prompt))
+                return [pair for pairs in results for pair in pairs]
+            
             # Use custom prompt if provided, otherwise use default
             prompt = custom_prompt if custom_prompt else self.default_prompt
             
+            cached = self._get_cached_cards("qa", prompt, text, text_hash)
+            if cached is not None:
+                return cached
+            
             # Format prompt with text
-            formatted_prompt = prompt.format(text=text)
+            system, user_message = split_prompt(prompt, text)
             
             logger.info(f"Using model: {self.model}")
             
             # Get completion from LLM
-            success, response = get_llm_completion(formatted_prompt, self.model)
+            success, response = get_llm_completion(user_message, self.model, system=system)
+            return self._store_cards("qa", prompt, text, self._parse_qa_response(success, response), text_hash)
             
-            if not success:
-                logger.error(f"Error getting LLM completion: {response}")
-                return []
+        except Exception as e:
+            logger.error(f"Error processing text with LLM: {e}")
+            import traceback
+            logger.error(traceback.format_exc())
+            return []
+
+    async def aprocess_text(self, text: str, custom_prompt: Optional[str] = None,
+                            text_hash: Optional[str] = None) -> List[Tuple[str, str]]:
+        """
+        Async variant of process_text that awaits the provider's async client.
+        
+        Args:
+            text: Text to process
+            custom_prompt: Optional custom prompt template
+            text_hash: Optional precomputed sha256 hex digest of text for the cache key
+            
+        Returns:
+            List of (question, answer) tuples
+        """
+        chunks = self.split_text_tokens(text)
+        if len(chunks) > 1:
+            logger.info(f"Text split into {len(chunks)} chunks")
+            results = await self.aprocess_text_batch(chunks, custom_prompt)
+            return [pair for pairs in results for pair in pairs]
+        return await self._aprocess_chunk(text, custom_prompt, text_hash)
+
+    async def _aprocess_chunk(self, text: str, custom_prompt: Optional[str] = None,
+                              text_hash: Optional[str] = None) -> List[Tuple[str, str]]:
+        """Generate Q&A pairs for a single chunk with one async request, without further splitting."""
+        try:
+            prompt = custom_prompt if custom_prompt else self.default_prompt
+            
+            cached = self._get_cached_cards("qa", prompt, text, text_hash)
+            if cached is not None:
+                return cached
             
-            # Log raw response for debugging
-            logger.info(f"Raw LLM response length: {len(response)}")
-            logger.info(f"Raw LLM response first 500 chars: {response[:500]}")
-            
-            # Parse response into Q&A pairs
-            qa_pairs = []
-            current_question = None
-            current_answer = []
-            
-            for line in response.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                if line.startswith('Q:'):
-                    # Save previous Q&A pair if exists
-                    if current_question and current_answer:
-                        qa_pairs.append((
-                            current_question, 
-                            '\n'.join(current_answer).strip()
-                        ))
-                        logger.info(f"Added Q&A pair: Q: {current_question[:50]}...")
-                    # Start new question
-                    current_question = line[2:].strip()
-                    current_answer = []
-                elif line.startswith('A:'):
-                    current_answer = [line[2:].strip()]
-                elif current_answer is not None:
-                    current_answer.append(line)
-            
-            # Add last Q&A pair
-            if current_question and current_answer:
-                qa_pairs.append((
-                    current_question, 
-                    '\n'.join(current_answer).strip()
-                ))
-                logger.info(f"Added final Q&A pair: Q: {current_question[:50]}...")
-            
-            logger.info(f"Total Q&A pairs extracted: {len(qa_pairs)}")
-            
-            return qa_pairs
+            system, user_message = split_prompt(prompt, text)
+            
+            logger.info(f"Using model: {self.model}")
+            
+            success, response = await aget_llm_completion(user_message, self.model, system=system)
+            return self._store_cards("qa", prompt, text, self._parse_qa_response(success, response), text_hash)
             
         except Exception as e:
             logger.error(f"Error processing text with LLM: {e}")
@@ -216,125 +501,350 @@ class LLMProcessor:
             logger.error(traceback.format_exc())
             return []
 
-    def create_cloze_deletions(self, text: str, custom_prompt: Optional[str] = None) -> List[Tuple[str, str]]:
+    def split_text(self, text: str, max_chars: int = CHUNK_CHARS) -> List[str]:
         """
-        Process text using LLM to generate cloze deletions.
+        Split text into chunks of at most max_chars, preferring paragraph boundaries.
         
         Args:
-            text: Text to process
+            text: Text to split
+            max_chars: Maximum characters per chunk
+            
+        Returns:
+            List of text chunks
+        """
+        chunks = []
+        current = []
+        current_size = 0
+        
+        for paragraph in text.split("\n\n"):
+            # Hard-split paragraphs that are too long on their own
+            pieces = [paragraph[i:i + max_chars] for i in range(0, len(paragraph), max_chars)] or [""]
+            for piece in pieces:
+                if current and current_size + len(piece) > max_chars:
+                    chunks.append("\n\n".join(current))
+                    current = []
+                    current_size = 0
+                current.append(piece)
+                current_size += len(piece) + 2
+        
+        if current:
+            chunks.append("\n\n".join(current))
+        
+        return [chunk for chunk in chunks if chunk.strip()]
+
+    def _get_encoder(self):
+        """Lazily load the tiktoken encoding for the current model, or None if unavailable."""
+        if self._encoder_model != self.model:
+            self._encoder_model = self.model
+            self._encoder = _load_encoder(self.model)
+        return self._encoder
+
+    def split_text_tokens(self, text: str, max_tokens: int = CHUNK_TOKENS,
+                          overlap: int = CHUNK_OVERLAP_TOKENS) -> List[str]:
+        """
+        Split text into windows of at most max_tokens, consecutive windows sharing overlap tokens.
+        
+        Falls back to split_text with an equivalent character budget when
+        tiktoken is not installed.
+        
+        Args:
+            text: Text to split
+            max_tokens: Maximum tokens per chunk
+            overlap: Tokens repeated at the start of each following chunk
+            
+        Returns:
+            List of text chunks (just [text] if it already fits)
+        """
+        encoder = self._get_encoder()
+        if encoder is None:
+            return self.split_text(text, max_tokens * CHARS_PER_TOKEN)
+        
+        # Text like "<|endoftext|>" (common in ML papers) is ordinary text here,
+        # not a special token; tiktoken raises on it by default
+        tokens = encoder.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return [text]
+        
+        # Tokens are byte sequences, so a window edge can fall inside a
+        # multibyte character; cut the text's bytes instead, moving each edge
+        # back to the start of the character it lands in
+        data = text.encode("utf-8")
+        offsets = [0]
+        for token_bytes in encoder.decode_tokens_bytes(tokens):
+            offsets.append(offsets[-1] + len(token_bytes))
+        
+        def char_start(offset: int) -> int:
+            while offset < len(data) and data[offset] & 0xC0 == 0x80:
+                offset -= 1
+            return offset
+        
+        step = max_tokens - overlap
+        return [
+            data[char_start(offsets[i]):char_start(offsets[min(i + max_tokens, len(tokens))])].decode("utf-8")
+            for i in range(0, len(tokens) - overlap, step)
+        ]
+
+    def process_text_batch(self, chunks: List[str], custom_prompt: Optional[str] = None,
+                           poll_interval: int = 30,
+                           cancel_event: Optional[threading.Event] = None) -> List[List[Tuple[str, str]]]:
+        """
+        Process text chunks through the provider's Batch API.
+        
+        Shorthand for process_text_bulk(chunks, mode="batch").
+        
+        Returns:
+            List of Q&A pair lists, one per chunk
+        """
+        return self.process_text_bulk(chunks, "batch", custom_prompt=custom_prompt, poll_interval=poll_interval,
+                                      cancel_event=cancel_event)
+
+    def process_text_bulk(self, texts: List[str], mode: str = "batch", card_type: str = "qa",
+                          custom_prompt: Optional[str] = None, poll_interval: int = 30,
+                          cancel_event: Optional[threading.Event] = None) -> List[List[Tuple[str, str]]]:
+        """
+        Generate cards for many texts at once.
+        
+        In "batch" mode every uncached text is submitted as a single provider
+        Batch API job, which costs roughly half as much as realtime calls but
+        can take minutes to hours, so this blocks until the job finishes. The
+        job's batch ID is recorded in the cache so a run interrupted while
+        waiting resumes the same job instead of paying for it again. In
+        "concurrent" mode (and for models without a Batch API) texts are sent
+        as parallel realtime requests.
+        
+        Must not be called from a running event loop.
+        
+        Args:
+            texts: Texts to process
+            mode: "batch" or "concurrent"
+            card_type: "qa" for Q&A pairs or "cloze" for cloze deletions
             custom_prompt: Optional custom prompt template
+            poll_interval: Seconds to wait between batch status checks
+            cancel_event: Optional event that stops waiting for a batch job;
+                its ID stays recorded so the next run resumes it
             
         Returns:
-            List of (cloze_text, back_extra) tuples
+            List of card lists, one per text
         """
-        default_cloze_prompt = """
-        Create Anki cloze deletion cards from the following text.
+        if card_type not in ("qa", "cloze"):
+            raise ValueError(f"Unknown card type: {card_type}")
+        if mode not in ("batch", "concurrent"):
+            raise ValueError(f"Unknown bulk mode: {mode}")
         
-        Guidelines:
-        1. Use EXACTLY this format with DOUBLE curly braces: {{c1::text}} for the first cloze in each sentence
-        2. Use {{c2::text}} for the second cloze, {{c3::text}} for the third, etc.
-        3. Create meaningful deletions that test understanding
-        4. Include helpful extra information after each card
-        5. Format each card exactly as:
+        if mode == "batch" and not supports_batch_api(self.model):
+            logger.info(f"{self.model} has no Batch API, using concurrent requests")
+            mode = "concurrent"
+        if mode == "concurrent":
+            if card_type == "cloze":
+                return asyncio.run(self.acreate_cloze_deletions_batch(texts, custom_prompt))
+            return asyncio.run(self.aprocess_text_batch(texts, custom_prompt))
         
-        Text: [Sentence with cloze deletions]
-        Extra: [Additional helpful information]
+        # Identical texts are sent once and their cards copied to each position
+        unique_texts, index_map = dedupe_texts(texts)
+        try:
+            if card_type == "cloze":
+                prompt = custom_prompt if custom_prompt else self.default_cloze_prompt
+                parse = self._parse_cloze_completion
+            else:
+                prompt = custom_prompt if custom_prompt else self.default_prompt
+                parse = self._parse_qa_response
+            
+            results = [self._get_cached_cards(card_type, prompt, text) for text in unique_texts]
+            pending = [i for i, cached in enumerate(results) if cached is None]
+            if not pending:
+                return _expand_results(results, index_map)
+            
+            # Every text shares the template, so they share its system prompt
+            system = split_prompt(prompt, "")[0]
+            user_messages = [split_prompt(prompt, unique_texts[i])[1] for i in pending]
+            job_hash = hashlib.sha256(
+                json.dumps([self.model, system, user_messages]).encode("utf-8")
+            ).hexdigest()
+            batch_id = self.cache.get_batch_id(job_hash)
+            if batch_id:
+                logger.info(f"Resuming {self.model} batch {batch_id}")
+            else:
+                logger.info(f"Submitting {len(pending)} texts to the {self.model} Batch API")
+            
+            completions = get_llm_batch_completion(
+                user_messages, self.model, poll_interval, batch_id,
+                on_submit=lambda new_id: self.cache.set_batch_id(job_hash, new_id),
+                system=system,
+                cancel_event=cancel_event
+            )
+            # Keep the ID of a job we stopped waiting for, or of a new job that
+            # produced nothing (likely interrupted while polling), so the next
+            # run can resume it; otherwise forget it
+            if cancel_event is not None and cancel_event.is_set():
+                logger.info(f"Stopped waiting for the {self.model} batch; the next run will resume it")
+            elif batch_id or any(success for success, _ in completions):
+                self.cache.set_batch_id(job_hash, None)
+            
+            for i, (success, response) in zip(pending, completions):
+                results[i] = self._store_cards(card_type, prompt, unique_texts[i], parse(success, response))
+            return _expand_results(results, index_map)
+            
+        except Exception as e:
+            logger.error(f"Error processing text batch with LLM: {e}")
+            return [[] for _ in texts]
+
+    async def aprocess_text_batch(self, chunks: List[str], custom_prompt: Optional[str] = None,
+                                  max_concurrency: Optional[int] = None) -> List[List[Tuple[str, str]]]:
+        """
+        Process text chunks concurrently with realtime requests.
         
-        Example:
-        Text: {{c1::Python}} was created by {{c2::Guido van Rossum}} in {{c3::1991}}.
-        Extra: Python is now one of the most popular programming languages.
+        Args:
+            chunks: Text chunks to process
+            custom_prompt: Optional custom prompt template
+            max_concurrency: Maximum number of requests in flight at once
+                (defaults to the processor's max_concurrency)
+            
+        Returns:
+            List of Q&A pair lists, one per chunk
+        """
+        unique_chunks, index_map = dedupe_texts(chunks)
+        results = await self._gather_bounded(
+            [self._aprocess_chunk(chunk, custom_prompt) for chunk in unique_chunks],
+            max_concurrency
+        )
+        return _expand_results(results, index_map)
+
+    async def _gather_bounded(self, coros: list, max_concurrency: Optional[int] = None) -> list:
+        """Await coroutines concurrently, at most max_concurrency at a time, preserving order."""
+        # Created per call: a semaphore made in __init__ would be bound to
+        # whichever event loop first used it on Python < 3.10
+        semaphore = asyncio.Semaphore(max_concurrency or self.max_concurrency)
         
-        IMPORTANT: 
-        - Use DOUBLE curly braces {{ }} not single ones { }
-        - Each card MUST have both Text: and Extra: lines
-        - Create at least 3-5 cloze cards from the text
-        - Make sure each cloze deletion tests important concepts
+        async def bounded(coro):
+            async with semaphore:
+                return await coro
         
-        Text:
-        {text}
+        return list(await asyncio.gather(*(bounded(coro) for coro in coros)))
+
+    def create_cloze_deletions(self, text: str, custom_prompt: Optional[str] = None) -> List[Tuple[str, str]]:
         """
+        Process text using LLM to generate cloze deletions.
         
+        Args:
+            text: Text to process
+            custom_prompt: Optional custom prompt template
+            
+        Returns:
+            List of (cloze_text, back_extra) tuples
+        """
         try:
             # Validate input text
             if not text or not text.strip():
                 logger.error("Empty input text provided")
                 return []
                 
-            prompt = custom_prompt if custom_prompt else default_cloze_prompt
-            formatted_prompt = prompt.format(text=text)
+            prompt = custom_prompt if custom_prompt else self.default_cloze_prompt
+            
+            cached = self._get_cached_cards("cloze", prompt, text)
+            if cached is not None:
+                return cached
+            
+            system, user_message = split_prompt(prompt, text)
             
             logger.info("Requesting cloze cards from LLM...")
-            success, response = get_llm_completion(formatted_prompt, self.model)
+            success, response = get_llm_completion(user_message, self.model, system=system)
+            return self._store_cards("cloze", prompt, text, self._parse_cloze_completion(success, response))
             
-            if not success:
-                logger.error(f"Error getting LLM completion for cloze cards: {response}")
-                return []
-                
-            if not response or not response.strip():
-                logger.error("Received empty response from LLM")
-                return []
-                
-            logger.info("Processing LLM response...")
-            
-            # Parse response into cloze cards
-            cloze_items = []
-            current_text = None
-            current_extra = []
-            
-            for line in response.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                if line.startswith('Text:'):
-                    # Save previous cloze item if exists
-                    if current_text and current_extra:
-                        cloze_items.append((
-                            current_text,
-                            '\n'.join(current_extra).strip()
-                        ))
-                    # Start new cloze item
-                    current_text = line[5:].strip()
-                    current_extra = []
-                elif line.startswith('Extra:'):
-                    current_extra = [line[6:].strip()]
-                elif current_extra is not None:
-                    current_extra.append(line)
-            
-            # Add last cloze item
-            if current_text and current_extra:
-                cloze_items.append((
-                    current_text,
-                    '\n'.join(current_extra).strip()
-                ))
-            
-            if not cloze_items:
-                logger.error("No valid cloze items found in LLM response")
-                logger.debug(f"Raw response: {response}")
+        except Exception as e:
+            logger.error(f"Error processing text for cloze cards: {str(e)}")
+            logger.exception("Full traceback:")
+            return []
+
+    async def acreate_cloze_deletions(self, text: str, custom_prompt: Optional[str] = None) -> List[Tuple[str, str]]:
+        """
+        Async version of create_cloze_deletions.
+        
+        Args:
+            text: Text to process
+            custom_prompt: Optional custom prompt template
+            
+        Returns:
+            List of (cloze_text, back_extra) tuples
+        """
+        try:
+            if not text or not text.strip():
+                logger.error("Empty input text provided")
                 return []
                 
-            logger.info(f"Found {len(cloze_items)} potential cloze items")
-            
-            # Fix and validate cloze syntax
-            validated_items = []
-            for text, extra in cloze_items:
-                # Try to fix single curly brace syntax
-                fixed_text = text
-                if '{c' in text and '::' in text and '}' in text and '{{' not in text:
-                    # Replace single braces with double braces
-                    fixed_text = text.replace('{c', '{{c').replace('}', '}}')
-                    logger.info(f"Fixed single braces in: {text[:50]}...")
-                
-                if '{{c' in fixed_text and '::' in fixed_text and '}}' in fixed_text:
-                    validated_items.append((fixed_text, extra))
-                    logger.info(f"Valid cloze card: {fixed_text[:50]}...")
-                else:
-                    logger.warning(f"Invalid cloze syntax in: {text[:50]}...")
+            prompt = custom_prompt if custom_prompt else self.default_cloze_prompt
+            
+            cached = self._get_cached_cards("cloze", prompt, text)
+            if cached is not None:
+                return cached
             
-            logger.info(f"Successfully created {len(validated_items)} cloze cards")
-            return validated_items
+            system, user_message = split_prompt(prompt, text)
+            
+            logger.info("Requesting cloze cards from LLM...")
+            success, response = await aget_llm_completion(user_message, self.model, system=system)
+            return self._store_cards("cloze", prompt, text, self._parse_cloze_completion(success, response))
             
         except Exception as e:
             logger.error(f"Error processing text for cloze cards: {str(e)}")
             logger.exception("Full traceback:")
-            return [] 
\ No newline at end of file
+            return []
+
+    async def acreate_cloze_deletions_batch(self, texts: List[str], custom_prompt: Optional[str] = None,
+                                            max_concurrency: Optional[int] = None) -> List[List[Tuple[str, str]]]:
+        """
+        Generate cloze deletions for several texts concurrently with realtime requests.
+        
+        Args:
+            texts: Texts to process
+            custom_prompt: Optional custom prompt template
+            max_concurrency: Maximum number of requests in flight at once
+                (defaults to the processor's max_concurrency)
+            
+        Returns:
+            List of cloze item lists, one per text
+        """
+        unique_texts, index_map = dedupe_texts(texts)
+        results = await self._gather_bounded(
+            [self.acreate_cloze_deletions(text, custom_prompt) for text in unique_texts],
+            max_concurrency
+        )
+        return _expand_results(results, index_map)
+
+    def create_cloze_deletions_batch(self, texts: List[str], custom_prompt: Optional[str] = None) -> List[List[Tuple[str, str]]]:
+        """
+        Blocking wrapper around acreate_cloze_deletions_batch.
+        
+        Must not be called from a running event loop.
+        
+        Returns:
+            List of cloze item lists, one per text
+        """
+        return asyncio.run(self.acreate_cloze_deletions_batch(texts, custom_prompt))
+
+    def _parse_cloze_completion(self, success: bool, response: str) -> List[Tuple[str, str]]:
+        """
+        Parse and validate an LLM completion into cloze items.
+        
+        Args:
+            success: Whether the completion call succeeded
+            response: The completion text, or an error message on failure
+            
+        Returns:
+            List of (cloze_text, back_extra) tuples
+        """
+        if not success:
+            logger.error(f"Error getting LLM completion for cloze cards: {response}")
+            return []
+            
+        if not response or not response.strip():
+            logger.error("Received empty response from LLM")
+            return []
+            
+        cloze_items = parse_cloze_response(response)
+        if not cloze_items:
+            logger.error("No valid cloze items found in LLM response")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Raw response: {response}")
+            return []
+        
+        # Fix and validate cloze syntax
+        return validate_cloze_items(cloze_items)
@@ -1,165 +1,651 @@
-import PyPDF2
-import pdfplumber
+import asyncio
+import functools
+import pypdfium2 as pdfium
 import re
-from typing import List, Tuple, Optional
+import io
+import mmap
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Tuple, Optional, Union
 import logging
 import os
 import sys
+from extraction_profiles import ExtractionProfile, PROFILE_SETTINGS, detect_profile, sample_page_indices
+
+try:
+    # Optional: RE2 compiles the marker patterns below to linear-time automata
+    import re2 as _marker_re
+except ImportError:
+    _marker_re = re
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Text extraction backends
+PDFIUM = "pdfium"
+PYPDF = "pypdf"
+PDFPLUMBER = "pdfplumber"
+
+# Page-count thresholds for choosing an extraction strategy
+TINY_PDF_PAGES = 10
+SMALL_PDF_PAGES = 50
+MEDIUM_PDF_PAGES = 200
+
+# Largest PDF memory-mapped by a 32-bit interpreter; bigger files could
+# exhaust its address space and are read as regular files instead
+MAX_MMAP_BYTES_32BIT = 1 << 30
+
+# Explicit Q&A formats, most common first, as (question marker, answer
+# marker, end of answer) patterns. They are plain patterns without
+# lookarounds so RE2 can compile them when installed.
+_STRUCTURED_QA_MARKERS = [
+    tuple(_marker_re.compile(f"(?i){pattern}") for pattern in patterns)
+    for patterns in (
+        (r"Q(?:uestion)?[\s:]+", r"A(?:nswer)?[\s:]+", r"Q(?:uestion)?[\s:]"),
+        (r"###\s*Q(?:uestion)?[\s:]*", r"###\s*A(?:nswer)?[\s:]*", r"###\s*Q"),
+    )
+]
+
+# Words that open a question when they are a sentence's first word
+_QUESTION_WORDS = frozenset({"what", "why", "how", "when", "where", "which", "who", "whose", "whom"})
+_AUX_VERBS = frozenset({
+    "is", "are", "was", "were", "do", "does", "did", "have", "has", "had",
+    "can", "could", "should", "would", "will",
+})
+_QUESTION_STARTS = _QUESTION_WORDS | _AUX_VERBS
+
+# Candidate sentence boundary: terminal punctuation, whitespace, then an uppercase letter
+_SENTENCE_BOUNDARY_RE = re.compile(r'[.!?]\s+(?=[A-Z])')
+
+# Words whose trailing period does not end a sentence (compared lowercased, without the period)
+_ABBREVIATIONS = frozenset({
+    "dr", "mr", "mrs", "ms", "prof", "sr", "jr", "st", "vs", "etc", "e.g", "i.e",
+    "fig", "figs", "eq", "vol", "al", "approx", "inc", "ltd", "co", "dept", "ch", "sec",
+})
+
+def _is_question(text: str) -> bool:
+    """
+    Whether a sentence looks like a question: it contains a question mark or
+    its first whitespace-delimited word is a question word or auxiliary verb.
+    """
+    if "?" in text:
+        return True
+    words = text.split(None, 1)
+    return bool(words) and words[0].lower() in _QUESTION_STARTS
+
+def _iter_marked_qa(text: str, question_re: Any, answer_re: Any, stop_re: Any) -> Iterator[Tuple[str, str]]:
+    """
+    Yield raw (question, answer) fields for one structured Q&A format.
+    
+    Each question runs from a question marker to the next answer marker, and
+    each answer runs to the next end-of-answer marker or the end of the text
+    (before a final newline). Every search starts where the previous one
+    stopped, so the text is scanned once, and a question marker without a
+    following answer ends the scan since no later one can have an answer
+    either.
+    """
+    text_end = len(text) - 1 if text.endswith("\n") else len(text)
+    pos = 0
+    while True:
+        question = question_re.search(text, pos)
+        if question is None:
+            return
+        answer = answer_re.search(text, question.end())
+        if answer is None:
+            return
+        stop = stop_re.search(text, answer.end())
+        pos = stop.start() if stop is not None else max(text_end, answer.end())
+        yield text[question.end():answer.start()], text[answer.end():pos]
+
+def _iter_sentences(text: str) -> Iterator[str]:
+    """
+    Yield stripped, non-empty sentences in a single pass.
+    
+    A boundary is a '.', '!' or '?' followed by whitespace and an uppercase
+    letter, unless the period ends a known abbreviation or a single-letter
+    initial (e.g. "Dr. Smith", "J. Smith").
+    """
+    start = 0
+    for match in _SENTENCE_BOUNDARY_RE.finditer(text):
+        end = match.start() + 1
+        if text[match.start()] == '.':
+            # Only the last word before the period matters
+            preceding = text[max(start, match.start() - 16):match.start()].split()
+            word = preceding[-1].lstrip('("\'').lower() if preceding else ""
+            if word in _ABBREVIATIONS or (len(word) == 1 and word.isalpha()):
+                continue
+        sentence = text[start:end].strip()
+        if sentence:
+            yield sentence
+        start = match.end()
+    sentence = text[start:].strip()
+    if sentence:
+        yield sentence
+
+def _optimal_workers(page_count: int) -> int:
+    """Number of worker processes for a large PDF: one per ~50 pages, capped at the CPU count."""
+    return max(1, min(os.cpu_count() or 1, page_count // SMALL_PDF_PAGES))
+
+def _pick_strategy(page_count: int) -> Tuple[str, int]:
+    """
+    Choose how to extract a page range based on its size.
+    
+    Returns:
+        (strategy, workers) where strategy is "batch", "stream" or "processes"
+    """
+    if page_count <= TINY_PDF_PAGES:
+        # Pool startup would cost more than it saves
+        return "batch", 1
+    if page_count <= SMALL_PDF_PAGES:
+        return "batch", 10
+    if page_count <= MEDIUM_PDF_PAGES:
+        return "stream", 1
+    return "processes", _optimal_workers(page_count)
+
+def _pdfium_page_text(pdf: pdfium.PdfDocument, index: int) -> str:
+    """Extract one page's text with PDFium, releasing the native page handles."""
+    page = pdf[index]
+    try:
+        textpage = page.get_textpage()
+        try:
+            return textpage.get_text_range().replace("\r\n", "\n")
+        finally:
+            textpage.close()
+    finally:
+        page.close()
+
+def _join_pages(pages: Iterable[str]) -> str:
+    """
+    Join page texts with newlines, writing each page into one buffer as it
+    is extracted instead of collecting every page in a list first.
+    """
+    buf = io.StringIO()
+    for i, page_text in enumerate(pages):
+        if i:
+            buf.write("\n")
+        buf.write(page_text)
+    return buf.getvalue()
+
+def _page_range(start_page: Optional[int], end_page: Optional[int], total_pages: int) -> Tuple[int, int]:
+    """Convert a 1-based page range into validated 0-based [start, end) indices."""
+    # Convert to 0-based index and handle None values
+    start_idx = (start_page - 1) if start_page is not None else 0
+    end_idx = min(end_page or total_pages, total_pages)
+    
+    # Validate page range
+    if start_idx < 0 or start_idx >= total_pages:
+        raise ValueError(f"Start page {start_page} is out of range (1-{total_pages})")
+    if end_idx <= start_idx:
+        raise ValueError(f"End page must be greater than start page")
+    
+    return start_idx, end_idx
+
+class PDFDocument:
+    """
+    A PDF opened once with one backend.
+    
+    Counting pages and extracting them through the same document avoids
+    parsing the file's cross-reference table a second time.
+    """
+    
+    def __init__(self, pdf_path: str, backend: str = PDFIUM, source: Any = None,
+                 plumber_kwargs: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Open the document.
+        
+        Args:
+            pdf_path: Path to PDF file
+            backend: PDFIUM, PYPDF or PDFPLUMBER
+            source: Optional file-like object (e.g. a memory map) for PyPDF2 and
+                pdfplumber to read instead of the path; PDFium always uses the path
+            plumber_kwargs: Extra keyword arguments for pdfplumber's extract_text
+        """
+        self.pdf_path = pdf_path
+        self.backend = backend
+        self.plumber_kwargs = plumber_kwargs or {}
+        source = source if source is not None else pdf_path
+        # PyPDF2 and pdfplumber are imported on first use: most runs only
+        # need PDFium, and together they add ~0.1 s to startup
+        if backend == PDFIUM:
+            self.handle = pdfium.PdfDocument(pdf_path)
+        elif backend == PDFPLUMBER:
+            import pdfplumber
+            self.handle = pdfplumber.open(source)
+        else:
+            import PyPDF2
+            self.handle = PyPDF2.PdfReader(source)
+
+    @property
+    def page_count(self) -> int:
+        """Total number of pages in the document."""
+        if self.backend == PDFIUM:
+            return len(self.handle)
+        return len(self.handle.pages)
+
+    def page_text(self, index: int) -> str:
+        """Text of the page at a 0-based index."""
+        if self.backend == PDFIUM:
+            return _pdfium_page_text(self.handle, index)
+        if self.backend == PDFPLUMBER:
+            return self.handle.pages[index].extract_text(**self.plumber_kwargs) or ""
+        return self.handle.pages[index].extract_text() or ""
+
+    def iter_pages(self, start_idx: int, end_idx: int) -> Iterator[str]:
+        """Yield the text of pages [start_idx, end_idx) (0-based)."""
+        for i in range(start_idx, end_idx):
+            yield self.page_text(i)
+
+    def text(self, start_page: Optional[int] = None, end_page: Optional[int] = None) -> str:
+        """
+        Extract the text of a page range.
+        
+        Args:
+            start_page: First page to extract (1-based index)
+            end_page: Last page to extract (1-based index)
+        """
+        return _join_pages(self.iter_pages(*_page_range(start_page, end_page, self.page_count)))
+
+    def close(self) -> None:
+        """Release the backend's document handle."""
+        if self.backend == PYPDF:
+            # PdfReader holds no resources beyond its source
+            return
+        self.handle.close()
+
+def _map_pdf(pdf_path: str) -> Union[mmap.mmap, BinaryIO]:
+    """
+    Open a PDF for random-access reading as a read-only memory map.
+    
+    Falls back to a regular file object for empty files (which cannot be
+    mapped) and, on 32-bit interpreters, for files over MAX_MMAP_BYTES_32BIT.
+    Either way the caller must close the result.
+    """
+    size = os.path.getsize(pdf_path)
+    if size == 0 or (sys.maxsize <= 2 ** 32 and size > MAX_MMAP_BYTES_32BIT):
+        return open(pdf_path, 'rb')
+    with open(pdf_path, 'rb') as file:
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+def _extract_page_range(args: Tuple[str, str, int, int, Dict[str, Any]]) -> List[str]:
+    """
+    Extract pages [start_idx, end_idx) with a fresh document handle.
+    
+    Module-level so it can be pickled for process pools; opening the document
+    per worker also keeps parser state out of shared threads.
+    """
+    pdf_path, backend, start_idx, end_idx, plumber_kwargs = args
+    if backend == PDFIUM:
+        document = PDFDocument(pdf_path, backend)
+        try:
+            return list(document.iter_pages(start_idx, end_idx))
+        finally:
+            document.close()
+    source = _map_pdf(pdf_path)
+    try:
+        document = PDFDocument(pdf_path, backend, source, plumber_kwargs)
+        try:
+            return list(document.iter_pages(start_idx, end_idx))
+        finally:
+            document.close()
+    finally:
+        source.close()
+
 class PDFProcessor:
-    def __init__(self):
+    def __init__(self) -> None:
         """Initialize the PDF processor."""
-        # No spaCy model loading
-        pass
+        # Read-only memory maps of opened PDFs, shared by every parser call on
+        # the same file so the OS pages it in once instead of per open()
+        self._mmaps: Dict[str, Union[mmap.mmap, BinaryIO]] = {}
 
-    def get_page_count(self, pdf_path: str) -> int:
-        """Get the total number of pages in the PDF."""
+    def _open_mmap(self, pdf_path: str) -> Union[mmap.mmap, BinaryIO]:
+        """Return a cached read-only memory map of the PDF (see _map_pdf), mapping it on first use."""
+        mm = self._mmaps.get(pdf_path)
+        if mm is None or mm.closed:
+            mm = _map_pdf(pdf_path)
+            self._mmaps[pdf_path] = mm
+        return mm
+
+    def close(self, pdf_path: Optional[str] = None) -> None:
+        """
+        Release cached memory maps.
+        
+        Args:
+            pdf_path: Only release the map for this file; release all if None
+        """
+        paths = [pdf_path] if pdf_path is not None else list(self._mmaps)
+        for path in paths:
+            mm = self._mmaps.pop(path, None)
+            if mm is not None:
+                mm.close()
+
+    def _open_document(self, pdf_path: str, backend: str = PDFIUM,
+                       plumber_kwargs: Optional[Dict[str, Any]] = None) -> PDFDocument:
+        """Open a PDFDocument, reading through the cached memory map where the backend allows it."""
+        source = None if backend == PDFIUM else self._open_mmap(pdf_path)
+        return PDFDocument(pdf_path, backend, source, plumber_kwargs)
+
+    @contextmanager
+    def open(self, pdf_path: str, backend: str = PDFIUM,
+             plumber_kwargs: Optional[Dict[str, Any]] = None) -> Iterator[PDFDocument]:
+        """
+        Open a PDF once for both counting and extracting its pages.
+        
+        Example:
+            with processor.open(pdf_path) as doc:
+                text = doc.text(1, min(10, doc.page_count))
+        
+        Args:
+            pdf_path: Path to PDF file
+            backend: PDFIUM, PYPDF or PDFPLUMBER
+            plumber_kwargs: Extra keyword arguments for pdfplumber's extract_text
+        """
+        document = self._open_document(pdf_path, backend, plumber_kwargs)
+        try:
+            yield document
+        finally:
+            document.close()
+
+    def get_page_count(self, pdf_path: str, document: Optional[PDFDocument] = None) -> int:
+        """
+        Get the total number of pages in the PDF.
+        
+        Args:
+            pdf_path: Path to PDF file
+            document: Optional already opened document (see open) to count
+                instead of opening the file again
+        """
         try:
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                return len(reader.pages)
+            if document is not None:
+                return document.page_count
+            with self.open(pdf_path) as document:
+                return document.page_count
         except Exception as e:
             logger.error(f"Error getting page count: {e}")
             return 0
 
-    def extract_text_pypdf(self, pdf_path: str, start_page: int = None, end_page: int = None) -> str:
+    def iter_pages_pdfium(self, pdf_path: str, start_page: Optional[int] = None, end_page: Optional[int] = None) -> Iterator[str]:
+        """
+        Yield the text of each page using PDFium.
+        
+        Args:
+            pdf_path: Path to PDF file
+            start_page: First page to extract (1-based index)
+            end_page: Last page to extract (1-based index)
+        """
+        with self.open(pdf_path, PDFIUM) as document:
+            yield from document.iter_pages(*_page_range(start_page, end_page, document.page_count))
+
+    def iter_pages_pypdf(self, pdf_path: str, start_page: Optional[int] = None, end_page: Optional[int] = None) -> Iterator[str]:
+        """
+        Yield the text of each page using PyPDF2.
+        
+        Args:
+            pdf_path: Path to PDF file
+            start_page: First page to extract (1-based index)
+            end_page: Last page to extract (1-based index)
+        """
+        with self.open(pdf_path, PYPDF) as document:
+            yield from document.iter_pages(*_page_range(start_page, end_page, document.page_count))
+
+    def iter_pages_pdfplumber(self, pdf_path: str, start_page: Optional[int] = None, end_page: Optional[int] = None,
+                              plumber_kwargs: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Yield the text of each page using pdfplumber.
+        
+        Args:
+            pdf_path: Path to PDF file
+            start_page: First page to extract (1-based index)
+            end_page: Last page to extract (1-based index)
+            plumber_kwargs: Extra keyword arguments for pdfplumber's extract_text
+        """
+        with self.open(pdf_path, PDFPLUMBER, plumber_kwargs) as document:
+            yield from document.iter_pages(*_page_range(start_page, end_page, document.page_count))
+
+    def extract_text_pdfium(self, pdf_path: str, start_page: Optional[int] = None, end_page: Optional[int] = None,
+                            document: Optional[PDFDocument] = None, num_workers: Optional[int] = None) -> str:
+        """
+        Extract text using PDFium (the fastest backend).
+        
+        Large page ranges are split across a worker pool (see iter_text).
+        
+        Args:
+            pdf_path: Path to PDF file
+            start_page: First page to extract (1-based index)
+            end_page: Last page to extract (1-based index)
+            document: Optional document already opened with this backend (see
+                open), read in-process instead of reopening the file
+            num_workers: Number of worker processes; 1 extracts in-process and
+                None picks a strategy from the page count
+        """
+        try:
+            if document is not None:
+                return document.text(start_page, end_page)
+            return _join_pages(self.iter_text(pdf_path, start_page=start_page, end_page=end_page, backend=PDFIUM,
+                                              num_workers=num_workers))
+        except Exception as e:
+            logger.error(f"Error extracting text with PDFium: {e}")
+            return ""
+
+    def extract_text_pypdf(self, pdf_path: str, start_page: Optional[int] = None, end_page: Optional[int] = None,
+                           document: Optional[PDFDocument] = None, num_workers: Optional[int] = None) -> str:
         """
         Extract text using PyPDF2.
         
+        Large page ranges are split across a worker pool (see iter_text).
+        
         Args:
             pdf_path: Path to PDF file
             start_page: First page to extract (1-based index)
             end_page: Last page to extract (1-based index)
+            document: Optional document already opened with this backend (see
+                open), read in-process instead of reopening the file
+            num_workers: Number of worker processes; 1 extracts in-process and
+                None picks a strategy from the page count
         """
         try:
-            with open(pdf_path, 'rb') as file:
-                reader = PyPDF2.PdfReader(file)
-                total_pages = len(reader.pages)
-                
-                # Convert to 0-based index and handle None values
-                start_idx = (start_page - 1) if start_page is not None else 0
-                end_idx = min(end_page or total_pages, total_pages)
-                
-                # Validate page range
-                if start_idx < 0 or start_idx >= total_pages:
-                    raise ValueError(f"Start page {start_page} is out of range (1-{total_pages})")
-                if end_idx <= start_idx:
-                    raise ValueError(f"End page must be greater than start page")
-                
-                text = "\n".join([
-                    reader.pages[i].extract_text() 
-                    for i in range(start_idx, end_idx)
-                ])
-                return text
+            if document is not None:
+                return document.text(start_page, end_page)
+            return _join_pages(self.iter_text(pdf_path, start_page=start_page, end_page=end_page, backend=PYPDF,
+                                              num_workers=num_workers))
         except Exception as e:
             logger.error(f"Error extracting text with PyPDF2: {e}")
             return ""
 
-    def extract_text_pdfplumber(self, pdf_path: str, start_page: int = None, end_page: int = None) -> str:
+    def extract_text_pdfplumber(self, pdf_path: str, start_page: Optional[int] = None, end_page: Optional[int] = None,
+                                document: Optional[PDFDocument] = None, num_workers: Optional[int] = None) -> str:
         """
         Extract text using pdfplumber (better for complex layouts).
         
+        Large page ranges are split across a worker pool (see iter_text).
+        
         Args:
             pdf_path: Path to PDF file
             start_page: First page to extract (1-based index)
             end_page: Last page to extract (1-based index)
+            document: Optional document already opened with this backend (see
+                open), read in-process instead of reopening the file
+            num_workers: Number of worker processes; 1 extracts in-process and
+                None picks a strategy from the page count
         """
         try:
-            with pdfplumber.open(pdf_path) as pdf:
-                total_pages = len(pdf.pages)
-                
-                # Convert to 0-based index and handle None values
-                start_idx = (start_page - 1) if start_page is not None else 0
-                end_idx = min(end_page or total_pages, total_pages)
-                
-                # Validate page range
-                if start_idx < 0 or start_idx >= total_pages:
-                    raise ValueError(f"Start page {start_page} is out of range (1-{total_pages})")
-                if end_idx <= start_idx:
-                    raise ValueError(f"End page must be greater than start page")
-                
-                text = "\n".join([
-                    pdf.pages[i].extract_text() 
-                    for i in range(start_idx, end_idx)
-                ])
-                return text
+            if document is not None:
+                return document.text(start_page, end_page)
+            return _join_pages(self.iter_text(pdf_path, start_page=start_page, end_page=end_page, backend=PDFPLUMBER,
+                                              num_workers=num_workers))
         except Exception as e:
             logger.error(f"Error extracting text with pdfplumber: {e}")
             return ""
 
-    def extract_text(self, pdf_path: str, use_plumber: bool = False, start_page: int = None, end_page: int = None) -> str:
+    def _iter_pages_pooled(self, pdf_path: str, backend: str, start_idx: int, end_idx: int,
+                           strategy: str, workers: int, plumber_kwargs: Dict[str, Any]) -> Iterator[str]:
+        """Yield page text in order, extracting contiguous page ranges on a worker pool."""
+        page_count = end_idx - start_idx
+        workers = min(workers, os.cpu_count() or 1, page_count)
+        pages_per_task = -(-page_count // workers)
+        tasks = [
+            (pdf_path, backend, i, min(i + pages_per_task, end_idx), plumber_kwargs)
+            for i in range(start_idx, end_idx, pages_per_task)
+        ]
+        
+        executor_cls = ProcessPoolExecutor if strategy == "processes" else ThreadPoolExecutor
+        with executor_cls(max_workers=len(tasks)) as executor:
+            for pages in executor.map(_extract_page_range, tasks):
+                yield from pages
+
+    def iter_text(self, pdf_path: str, use_plumber: bool = False, start_page: Optional[int] = None, end_page: Optional[int] = None,
+                  profile: Optional[ExtractionProfile] = None, backend: Optional[str] = None,
+                  num_workers: Optional[int] = None) -> Iterator[str]:
+        """
+        Yield text from PDF one page at a time using specified method.
+        
+        The extraction strategy is picked from the number of pages requested:
+        small ranges are read in-process, mid-sized ones on a thread pool
+        (except with PDFium, which is not thread-safe) and large ones on a
+        process pool.
+        
+        Unlike extract_text, errors are raised to the caller instead of
+        being swallowed, since pages may already have been consumed.
+        
+        Args:
+            pdf_path: Path to PDF file
+            use_plumber: Whether to use pdfplumber instead of PDFium
+            start_page: First page to extract (1-based index)
+            end_page: Last page to extract (1-based index)
+            profile: Document profile whose settings override use_plumber;
+                ExtractionProfile.AUTO detects one from the document
+            backend: Explicit backend (PDFIUM, PYPDF or PDFPLUMBER), overriding
+                use_plumber and profile
+            num_workers: Explicit number of worker processes, overriding the
+                page-count heuristic; 1 extracts in-process
+        """
+        # The document opened to count pages (and detect the profile) is kept
+        # for in-process extraction, so the file is only parsed once
+        document = None
+        try:
+            if profile is ExtractionProfile.AUTO and backend is None:
+                document = self._open_document(pdf_path, PDFIUM)
+                has_form = document.handle.get_formtype() != pdfium.raw.FORMTYPE_NONE
+                page_texts = [document.page_text(i) for i in sample_page_indices(document.page_count)]
+                profile = detect_profile(pdf_path, page_texts, has_form)
+            
+            plumber_kwargs: Dict[str, Any] = {}
+            if profile is not None and backend is None:
+                settings = PROFILE_SETTINGS[profile]
+                use_plumber = settings.use_plumber
+                plumber_kwargs = settings.plumber_kwargs()
+                logger.info(f"Using '{profile.value}' extraction profile")
+            if backend is None:
+                backend = PDFPLUMBER if use_plumber else PDFIUM
+            
+            if document is not None and document.backend != backend:
+                document.close()
+                document = None
+            if document is None:
+                document = self._open_document(pdf_path, backend, plumber_kwargs)
+            start_idx, end_idx = _page_range(start_page, end_page, document.page_count)
+            
+            if num_workers is not None:
+                strategy, workers = ("processes", num_workers) if num_workers > 1 else ("stream", 1)
+            else:
+                strategy, workers = _pick_strategy(end_idx - start_idx)
+            if backend == PDFIUM and strategy != "processes":
+                # PDFium must not be called from several threads at once, and it
+                # is fast enough that a thread pool would not pay off anyway
+                strategy, workers = "stream", 1
+            logger.info(f"Extracting {end_idx - start_idx} pages with {backend} using '{strategy}' strategy with {workers} worker(s)")
+        except Exception:
+            if document is not None:
+                document.close()
+            raise
+        
+        if workers > 1:
+            document.close()
+            return self._iter_pages_pooled(pdf_path, backend, start_idx, end_idx, strategy, workers, plumber_kwargs)
+        return self._iter_document(document, start_idx, end_idx)
+
+    def _iter_document(self, document: PDFDocument, start_idx: int, end_idx: int) -> Iterator[str]:
+        """Yield pages [start_idx, end_idx) from an open document, closing it when done."""
+        try:
+            yield from document.iter_pages(start_idx, end_idx)
+        finally:
+            document.close()
+
+    def iter_text_batches(self, pdf_path: str, batch_pages: int = 5, use_plumber: bool = False,
+                          start_page: Optional[int] = None, end_page: Optional[int] = None,
+                          profile: Optional[ExtractionProfile] = None) -> Iterator[str]:
+        """
+        Yield the text of every batch_pages consecutive pages as one string.
+        
+        Lets callers start working on the first pages while later ones are
+        still being extracted. Errors are raised as in iter_text.
+        
+        Args:
+            pdf_path: Path to PDF file
+            batch_pages: Number of pages joined into each yielded batch
+            use_plumber: Whether to use pdfplumber instead of PDFium
+            start_page: First page to extract (1-based index)
+            end_page: Last page to extract (1-based index)
+            profile: Optional document profile overriding use_plumber
+        """
+        batch: List[str] = []
+        for page_text in self.iter_text(pdf_path, use_plumber, start_page, end_page, profile):
+            batch.append(page_text)
+            if len(batch) == batch_pages:
+                yield "\n".join(batch)
+                batch = []
+        if batch:
+            yield "\n".join(batch)
+
+    def extract_text(self, pdf_path: str, use_plumber: bool = False, start_page: Optional[int] = None, end_page: Optional[int] = None,
+                     profile: Optional[ExtractionProfile] = None) -> str:
         """
         Extract text from PDF using specified method.
         
         Args:
             pdf_path: Path to PDF file
-            use_plumber: Whether to use pdfplumber instead of PyPDF2
+            use_plumber: Whether to use pdfplumber instead of PDFium
             start_page: First page to extract (1-based index)
             end_page: Last page to extract (1-based index)
+            profile: Optional document profile overriding use_plumber
         """
-        if use_plumber:
-            return self.extract_text_pdfplumber(pdf_path, start_page, end_page)
-        return self.extract_text_pypdf(pdf_path, start_page, end_page)
+        try:
+            return _join_pages(self.iter_text(pdf_path, use_plumber, start_page, end_page, profile))
+        except Exception as e:
+            logger.error(f"Error extracting text: {e}")
+            return ""
 
     def parse_structured_qa(self, text: str) -> List[Tuple[str, str]]:
         """Parse text with explicit Q&A markers."""
-        qa_pairs = []
-        
-        # Try different Q&A patterns
-        patterns = [
-            r"Q(?:uestion)?[\s:]+(.*?)A(?:nswer)?[\s:]+(.*?)(?=Q(?:uestion)?[\s:]|$)",
-            r"###[\s]*Q(?:uestion)?[\s:]*(.*?)###[\s]*A(?:nswer)?[\s:]*(.*?)(?=###[\s]*Q|$)",
-        ]
+        qa_pairs: List[Tuple[str, str]] = []
         
-        for pattern in patterns:
-            matches = re.findall(pattern, text, re.DOTALL | re.IGNORECASE)
-            if matches:
-                qa_pairs.extend([
-                    (q.strip(), a.strip()) 
-                    for q, a in matches 
-                    if q.strip() and a.strip()
-                ])
+        # Try each Q&A format in turn, stopping at the first one that matches
+        for markers in _STRUCTURED_QA_MARKERS:
+            for question, answer in _iter_marked_qa(text, *markers):
+                question, answer = question.strip(), answer.strip()
+                if question and answer:
+                    qa_pairs.append((question, answer))
+            if qa_pairs:
+                break
                 
         return qa_pairs
 
     def is_question(self, text: str) -> bool:
-        """Determine if a sentence is likely a question using regex patterns."""
-        # Check for question marks
-        if "?" in text:
-            return True
-            
-        # Check for question words
-        question_words = {"what", "why", "how", "when", "where", "which", "who", "whose", "whom"}
-        first_word = text.split()[0].lower() if text.split() else ""
-        if first_word in question_words:
-            return True
-            
-        # Check for auxiliary verbs at start
-        aux_verbs = {"is", "are", "was", "were", "do", "does", "did", "have", "has", "had", "can", "could", "should", "would", "will"}
-        if first_word in aux_verbs:
-            return True
-            
-        return False
+        """Determine if a sentence is likely a question from its punctuation and first word."""
+        return _is_question(text)
 
     def parse_unstructured_text(self, text: str) -> List[Tuple[str, str]]:
         """Parse text without explicit Q&A markers using regex-based sentence splitting."""
-        qa_pairs = []
-        
-        # Split into sentences using regex
-        # This pattern looks for sentence boundaries (period, question mark, exclamation point)
-        # followed by a space and uppercase letter or end of string
-        sentence_pattern = r'(?<=[.!?])\s+(?=[A-Z])'
-        sentences = [s.strip() for s in re.split(sentence_pattern, text) if s.strip()]
-        
-        for i, sent in enumerate(sentences[:-1]):
-            if self.is_question(sent):
-                # Use next sentence as answer
-                qa_pairs.append((sent, sentences[i + 1]))
-                
+        qa_pairs: List[Tuple[str, str]] = []
+        
+        # Pair each question with the next sentence as they are split, without
+        # keeping a list of every sentence
+        previous: Optional[str] = None
+        for sentence in _iter_sentences(text):
+            if previous is not None and _is_question(previous):
+                qa_pairs.append((previous, sentence))
+            previous = sentence
+        
         return qa_pairs
 
     def parse_content(self, text: str) -> List[Tuple[str, str]]:
@@ -173,6 +659,26 @@ class PDFProcessor:
             
         return qa_pairs
 
+    def process_pdf_streaming(self, pdf_path: str, use_plumber: bool = False, start_page: Optional[int] = None,
+                              end_page: Optional[int] = None,
+                              profile: Optional[ExtractionProfile] = None) -> Iterator[Tuple[str, str]]:
+        """
+        Yield Q&A pairs page by page, so only one page's text is held at a time.
+        
+        Each page is parsed on its own, so a pair split across a page break
+        is not found; use process_pdf when that matters more than memory.
+        Errors are raised as in iter_text.
+        
+        Args:
+            pdf_path: Path to PDF file
+            use_plumber: Whether to use pdfplumber instead of PDFium
+            start_page: First page to parse (1-based index)
+            end_page: Last page to parse (1-based index)
+            profile: Optional document profile overriding use_plumber
+        """
+        for page_text in self.iter_text(pdf_path, use_plumber, start_page, end_page, profile):
+            yield from self.parse_content(page_text)
+
     def process_pdf(self, pdf_path: str, use_plumber: bool = False) -> List[Tuple[str, str]]:
         """Process PDF and return Q&A pairs."""
         text = self.extract_text(pdf_path, use_plumber)
@@ -180,4 +686,21 @@ class PDFProcessor:
             logger.error("No text extracted from PDF")
             return []
             
-        return self.parse_content(text) 
\ No newline at end of file
+        return self.parse_content(text) 
+
+    async def aprocess_pdf(self, pdf_path: str, use_plumber: bool = False) -> List[Tuple[str, str]]:
+        """
+        Async version of process_pdf.
+        
+        Extraction and parsing run on the default executor, so an event loop
+        (e.g. one driving LLM requests) keeps running meanwhile.
+        
+        Returns:
+            List of (question, answer) tuples
+        """
+        loop = asyncio.get_running_loop()
+        text = await loop.run_in_executor(None, functools.partial(self.extract_text, pdf_path, use_plumber))
+        if not text:
+            logger.error("No text extracted from PDF")
+            return []
+        return await loop.run_in_executor(None, self.parse_content, text)
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from pdf_processor import PDFProcessor
+from llm_processor import LLMProcessor
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Extracted batches allowed to wait for an LLM worker; bounds memory when
+# extraction outpaces the API
+QUEUE_SIZE = 8
+
+async def aprocess_pdf_pipelined(pdf_processor: PDFProcessor, llm_processor: LLMProcessor, pdf_path: str,
+                                 custom_prompt: Optional[str] = None, batch_pages: int = 5,
+                                 workers: Optional[int] = None, **extract_kwargs) -> List[Tuple[str, str]]:
+    """
+    Generate Q&A pairs from a PDF, overlapping extraction with LLM requests.
+
+    Pages are extracted on an executor thread in batches of batch_pages and
+    queued; worker coroutines send each batch to the LLM as soon as it
+    arrives, so later pages are extracted while earlier ones are in flight.
+
+    Args:
+        pdf_processor: Processor used to extract the text
+        llm_processor: Processor used to generate the Q&A pairs
+        pdf_path: Path to PDF file
+        custom_prompt: Optional custom prompt template
+        batch_pages: Number of pages sent to the LLM per request
+        workers: Number of concurrent LLM requests (defaults to the
+            LLM processor's max_concurrency)
+        **extract_kwargs: use_plumber, start_page, end_page or profile,
+            passed to PDFProcessor.iter_text_batches
+
+    Returns:
+        List of (question, answer) tuples in page order
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+    workers = workers or llm_processor.max_concurrency
+    results: Dict[int, List[Tuple[str, str]]] = {}
+
+    def produce():
+        """Extract page batches and queue them with their sequence numbers (runs on a worker thread)."""
+        try:
+            batches = pdf_processor.iter_text_batches(pdf_path, batch_pages, **extract_kwargs)
+            for seq, text in enumerate(batches):
+                # Blocks this thread while the queue is full
+                asyncio.run_coroutine_threadsafe(queue.put((seq, text)), loop).result()
+        finally:
+            # One stop marker per worker
+            for _ in range(workers):
+                asyncio.run_coroutine_threadsafe(queue.put(None), loop).result()
+
+    async def consume():
+        """Send queued batches to the LLM until a stop marker arrives."""
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            seq, text = item
+            try:
+                results[seq] = await llm_processor.aprocess_text(text, custom_prompt)
+            except Exception as e:
+                # Keep draining: a consumer that stopped would leave the
+                # producer blocked on a full queue forever
+                logger.error(f"Error processing page batch {seq}: {e}")
+                results[seq] = []
+
+    await asyncio.gather(
+        loop.run_in_executor(None, produce),
+        *(consume() for _ in range(workers))
+    )
+    logger.info(f"Processed {len(results)} page batches from {pdf_path}")
+    return [pair for seq in sorted(results) for pair in results[seq]]
+
+def process_pdf_pipelined(pdf_processor: PDFProcessor, llm_processor: LLMProcessor, pdf_path: str,
+                          custom_prompt: Optional[str] = None, batch_pages: int = 5,
+                          workers: Optional[int] = None, **extract_kwargs) -> List[Tuple[str, str]]:
+    """
+    Blocking wrapper around aprocess_pdf_pipelined.
+
+    Must not be called from a running event loop.
+
+    Returns:
+        List of (question, answer) tuples in page order
+    """
+    return asyncio.run(aprocess_pdf_pipelined(
+        pdf_processor, llm_processor, pdf_path, custom_prompt, batch_pages, workers, **extract_kwargs
+    ))
@@ -1,10 +1,14 @@
 import pytest
+import asyncio
 from pathlib import Path
 import tempfile
 import os
-from pdf_processor import PDFProcessor
+from pdf_processor import PDFProcessor, PDFIUM, PYPDF, PDFPLUMBER
 from anki_generator import AnkiDeckGenerator
-from llm_processor import LLMProcessor
+from llm_processor import LLMProcessor, parse_qa_response, parse_cloze_response, validate_cloze_items, split_prompt
+from utils.llm_cache import LLMCache
+from extraction_profiles import ExtractionProfile, detect_profile
+from pipeline import process_pdf_pipelined
 
 # Sample test data
 SAMPLE_TEXT = """
@@ -36,8 +40,8 @@ def anki_generator():
     return AnkiDeckGenerator()
 
 @pytest.fixture
-def llm_processor():
-    return LLMProcessor()
+def llm_processor(tmp_path):
+    return LLMProcessor(cache=LLMCache(db_path=str(tmp_path / "cache.db")))
 
 @pytest.fixture
 def temp_pdf():
@@ -54,18 +58,143 @@ def temp_pdf():
         
         return tmp.name
 
+def make_pdf(page_count):
+    """Create a temporary PDF with one numbered line per page."""
+    from reportlab.pdfgen import canvas
+    
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        c = canvas.Canvas(tmp.name)
+        for i in range(page_count):
+            c.drawString(100, 750, f"Page {i + 1} of the test document.")
+            c.showPage()
+        c.save()
+        return tmp.name
+
 def test_pdf_text_extraction(pdf_processor, temp_pdf):
     """Test PDF text extraction."""
     text = pdf_processor.extract_text(temp_pdf)
     assert text, "Text should be extracted from PDF"
     assert "Python" in text, "Extracted text should contain expected content"
 
+def test_pdf_backends_agree(pdf_processor):
+    """Test that the PDFium, PyPDF2 and pdfplumber backends extract the same pages."""
+    pdf_path = make_pdf(3)
+    try:
+        for extract in (pdf_processor.extract_text_pdfium, pdf_processor.extract_text_pypdf,
+                        pdf_processor.extract_text_pdfplumber):
+            text = extract(pdf_path, 2, 3)
+            assert "Page 2 of" in text and "Page 3 of" in text and "Page 1 of" not in text, \
+                f"{extract.__name__} should extract exactly the requested pages"
+    finally:
+        pdf_processor.close()
+        os.unlink(pdf_path)
+
+def test_pdf_document_single_open(pdf_processor):
+    """Test that an opened document serves both the page count and extraction."""
+    pdf_path = make_pdf(4)
+    try:
+        for backend, extract in ((PDFIUM, pdf_processor.extract_text_pdfium),
+                                 (PYPDF, pdf_processor.extract_text_pypdf),
+                                 (PDFPLUMBER, pdf_processor.extract_text_pdfplumber)):
+            with pdf_processor.open(pdf_path, backend) as doc:
+                assert pdf_processor.get_page_count(pdf_path, document=doc) == 4, \
+                    f"{backend} should count every page"
+                text = extract(pdf_path, 2, doc.page_count, document=doc)
+            assert text == extract(pdf_path, 2, 4), f"{backend} should match path-based extraction"
+    finally:
+        pdf_processor.close()
+        os.unlink(pdf_path)
+
 def test_pdf_text_extraction_with_plumber(pdf_processor, temp_pdf):
     """Test PDF text extraction using pdfplumber."""
     text = pdf_processor.extract_text(temp_pdf, use_plumber=True)
     assert text, "Text should be extracted from PDF using pdfplumber"
     assert "Python" in text, "Extracted text should contain expected content"
 
+def test_pdf_text_streaming(pdf_processor, temp_pdf):
+    """Test that page-by-page extraction matches full extraction."""
+    pages = list(pdf_processor.iter_text(temp_pdf))
+    assert len(pages) == 1, "Should yield one entry per page"
+    assert "\n".join(pages) == pdf_processor.extract_text(temp_pdf), "Streamed pages should join to the full text"
+
+@pytest.mark.parametrize("page_count", [5, 30, 250])
+def test_pdf_extraction_strategies(pdf_processor, page_count):
+    """Test that every extraction strategy returns pages in order."""
+    pdf_path = make_pdf(page_count)
+    try:
+        pages = list(pdf_processor.iter_text(pdf_path, start_page=2))
+        assert len(pages) == page_count - 1, "Should yield one entry per requested page"
+        assert all(f"Page {i + 2} " in page for i, page in enumerate(pages)), "Pages should be in document order"
+        assert pages == list(pdf_processor.iter_pages_pdfium(pdf_path, start_page=2)), "Should match sequential extraction"
+    finally:
+        pdf_processor.close()
+        os.unlink(pdf_path)
+
+def test_pdf_explicit_worker_count(pdf_processor):
+    """Test that an explicit process count gives the same text as in-process extraction."""
+    pdf_path = make_pdf(6)
+    try:
+        for extract in (pdf_processor.extract_text_pypdf, pdf_processor.extract_text_pdfplumber):
+            assert extract(pdf_path, num_workers=2) == extract(pdf_path, num_workers=1), \
+                f"{extract.__name__} should not depend on the worker count"
+    finally:
+        pdf_processor.close()
+        os.unlink(pdf_path)
+
+def test_pdf_memory_map_reuse(pdf_processor, temp_pdf):
+    """Test that repeated PyPDF2/pdfplumber reads of a PDF share one memory map until closed."""
+    assert pdf_processor.extract_text_pypdf(temp_pdf), "Text should be extracted from the mapped PDF"
+    mm = pdf_processor._mmaps[temp_pdf]
+    assert pdf_processor.extract_text_pdfplumber(temp_pdf), "Text should be extracted from the mapped PDF"
+    assert pdf_processor._mmaps[temp_pdf] is mm, "The memory map should be reused across calls"
+    pdf_processor.close()
+    assert mm.closed and not pdf_processor._mmaps, "close() should release all memory maps"
+
+def test_extraction_profiles(pdf_processor, temp_pdf):
+    """Test profile detection and extraction with explicit and automatic profiles."""
+    page_text = ["Question: What is Python? Answer: Python is a programming language."]
+    assert detect_profile("policy_handbook.pdf", page_text) == ExtractionProfile.POLICY, \
+        "Filename keywords should pick a profile"
+    assert detect_profile("platform_information.pdf", page_text) == ExtractionProfile.MIXED, \
+        "Keywords should only match whole words"
+    assert detect_profile("scan.pdf", ["", "", ""]) == ExtractionProfile.SCANNED_OCR, \
+        "Pages without text should be treated as scans"
+    for profile in ExtractionProfile:
+        text = pdf_processor.extract_text(temp_pdf, profile=profile)
+        assert "Python" in text, f"Text should be extracted with the {profile.value} profile"
+
+def test_auto_profile_short_cover(pdf_processor):
+    """Test that a short cover page does not make a text PDF count as scanned."""
+    from reportlab.pdfgen import canvas
+    
+    with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as tmp:
+        c = canvas.Canvas(tmp.name)
+        c.drawString(100, 750, "Cover")
+        c.showPage()
+        for i in range(3):
+            for line in range(20):
+                c.drawString(72, 750 - 15 * line, f"Page {i + 2}, line {line + 1} of ordinary body text.")
+            c.showPage()
+        c.save()
+        pdf_path = tmp.name
+    try:
+        auto_text = pdf_processor.extract_text(pdf_path, profile=ExtractionProfile.AUTO)
+        assert auto_text == pdf_processor.extract_text(pdf_path), \
+            "A text PDF with a short cover should use the plain PDFium path"
+    finally:
+        pdf_processor.close()
+        os.unlink(pdf_path)
+
+def test_pdf_streaming_qa(pdf_processor, temp_pdf):
+    """Test that page-by-page Q&A parsing matches whole-document parsing for a single page."""
+    assert list(pdf_processor.process_pdf_streaming(temp_pdf)) == pdf_processor.process_pdf(temp_pdf), \
+        "Streaming should yield the same pairs"
+
+def test_async_pdf_processing(pdf_processor, temp_pdf):
+    """Test that async PDF processing matches the blocking version."""
+    assert asyncio.run(pdf_processor.aprocess_pdf(temp_pdf)) == pdf_processor.process_pdf(temp_pdf), \
+        "Async processing should yield the same pairs"
+
 def test_structured_qa_parsing(pdf_processor):
     """Test parsing of structured Q&A format."""
     qa_pairs = pdf_processor.parse_structured_qa(SAMPLE_TEXT)
@@ -73,6 +202,12 @@ def test_structured_qa_parsing(pdf_processor):
     assert qa_pairs[0][0].strip() == "What is Python?", "First question should match"
     assert "high-level" in qa_pairs[0][1], "First answer should match"
 
+def test_structured_qa_without_answers(pdf_processor):
+    """Test that text with question-like markers but no answers is scanned once and yields nothing."""
+    # Every "q " starts a candidate question; none has an answer marker after it
+    assert pdf_processor.parse_structured_qa("Iraq is big. " * 5000) == [], \
+        "Text without answer markers should yield no pairs"
+
 def test_unstructured_text_parsing(pdf_processor):
     """Test parsing of unstructured text."""
     text = "What is Python? Python is a programming language. How old is Python? Python was created in 1991."
@@ -80,6 +215,13 @@ def test_unstructured_text_parsing(pdf_processor):
     assert len(qa_pairs) >= 2, "Should extract at least two Q&A pairs"
     assert all(pair[0].strip().endswith('?') for pair in qa_pairs), "Questions should end with question mark"
 
+def test_unstructured_text_abbreviations(pdf_processor):
+    """Test that abbreviations and initials do not end a sentence."""
+    text = "Who founded the lab? Dr. J. Smith founded it, e.g. in the 1990s. Why? Funding."
+    qa_pairs = pdf_processor.parse_unstructured_text(text)
+    assert qa_pairs[0] == ("Who founded the lab?", "Dr. J. Smith founded it, e.g. in the 1990s."), \
+        "The answer should be the whole following sentence"
+
 def test_anki_deck_creation(anki_generator):
     """Test Anki deck creation."""
     qa_pairs = [
@@ -94,6 +236,15 @@ def test_anki_deck_creation(anki_generator):
         assert Path(output_file).exists(), "Deck file should exist"
         assert output_file.endswith('.apkg'), "Should create .apkg file"
 
+def test_async_deck_creation(anki_generator):
+    """Test writing a deck package through the async API."""
+    qa_pairs = [("What is Python?", "A programming language")]
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir)
+        output_file = asyncio.run(anki_generator.acreate_deck(qa_pairs, "async_deck"))
+        assert output_file and Path(output_file).exists(), "Async deck file should exist"
+
 def test_cloze_deck_creation(anki_generator):
     """Test Anki cloze deck creation."""
     cloze_items = [
@@ -108,6 +259,19 @@ def test_cloze_deck_creation(anki_generator):
         assert Path(output_file).exists(), "Deck file should exist"
         assert output_file.endswith('_cloze.apkg'), "Should create _cloze.apkg file"
 
+def test_cloze_deck_skips_malformed_items(anki_generator):
+    """Test that malformed cloze markers are rejected."""
+    cloze_items = [
+        ("{c1::Python} is a programming language.", "Single braces"),
+        ("Python was created in {{c1::}}.", "Empty deletion"),
+        ("Python uses {{c::indentation}}.", "Missing cloze number"),
+    ]
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        os.chdir(tmpdir)
+        output_file = anki_generator.create_cloze_deck(cloze_items, "invalid_cloze_deck")
+        assert output_file is None, "Should not create a deck from malformed cloze items"
+
 def test_llm_text_processing(llm_processor):
     """Test LLM text processing."""
     text = "Python is a high-level programming language created by Guido van Rossum."
@@ -124,6 +288,382 @@ def test_llm_cloze_processing(llm_processor):
     if cloze_items:  # Only check if LLM returned results
         assert all(isinstance(item, tuple) and len(item) == 2 for item in cloze_items), "Each item should be a tuple of 2 elements"
 
+def test_concurrent_cloze_batch(llm_processor, monkeypatch):
+    """Test that batched cloze requests run concurrently and keep input order."""
+    import llm_processor as llm_module
+    
+    async def fake_completion(query, model, system=None):
+        await asyncio.sleep(0.01)
+        topic = "second" if "second text" in query else "first"
+        return True, f"Text: {{{{c1::{topic}}}}} topic.\nExtra: about the {topic} text"
+    
+    monkeypatch.setattr(llm_module, "aget_llm_completion", fake_completion)
+    results = llm_processor.create_cloze_deletions_batch(["The first text.", "The second text."])
+    assert results == [
+        [("{{c1::first}} topic.", "about the first text")],
+        [("{{c1::second}} topic.", "about the second text")],
+    ], "Each text should get its own cloze items in input order"
+    
+    async def failing_completion(query, model, system=None):
+        return False, "should not be called"
+    
+    monkeypatch.setattr(llm_module, "aget_llm_completion", failing_completion)
+    assert llm_processor.create_cloze_deletions_batch(["The first text.", "The second text."]) == results, \
+        "Repeated texts should be served from the cache"
+
+def test_cache_separates_card_types(llm_processor, monkeypatch):
+    """Test that Q&A and cloze results for the same prompt and text are cached separately."""
+    import llm_processor as llm_module
+    queries = []
+    responses = ["Q: What is Python?\nA: A language", "Text: {{c1::Python}} is a language.\nExtra: Scripting"]
+    
+    def fake_completion(query, model, system=None):
+        queries.append(query)
+        return True, responses[len(queries) - 1]
+    
+    monkeypatch.setattr(llm_module, "get_llm_completion", fake_completion)
+    prompt = "Make cards from this text:\n{text}"
+    text = "Python is a language."
+    assert llm_processor.process_text(text, prompt) == [("What is Python?", "A language")]
+    assert llm_processor.create_cloze_deletions(text, prompt) == [("{{c1::Python}} is a language.", "Scripting")], \
+        "Cloze cards should not be served from the Q&A cache entry"
+    assert len(queries) == 2
+    assert llm_processor.process_text(text, prompt) == [("What is Python?", "A language")]
+    assert len(queries) == 2, "Repeated requests of either type should still hit the cache"
+
+def test_regenerate_bypasses_cache(llm_processor, monkeypatch):
+    """Test that regenerate sends the request again and replaces the cached cards."""
+    import llm_processor as llm_module
+    queries = []
+    
+    def fake_completion(query, model, system=None):
+        queries.append(query)
+        return True, f"Q: Attempt?\nA: {len(queries)}"
+    
+    monkeypatch.setattr(llm_module, "get_llm_completion", fake_completion)
+    text = "Python is a language."
+    assert llm_processor.process_text(text) == [("Attempt?", "1")]
+    llm_processor.regenerate = True
+    assert llm_processor.process_text(text) == [("Attempt?", "2")], "Regenerating should skip the cached cards"
+    llm_processor.regenerate = False
+    assert llm_processor.process_text(text) == [("Attempt?", "2")], "Regenerated cards should replace the cached ones"
+    assert len(queries) == 2
+
+def test_duplicate_chunks_sent_once(llm_processor, monkeypatch):
+    """Test that identical chunks are only sent to the LLM once."""
+    import llm_processor as llm_module
+    queries = []
+    
+    async def fake_completion(query, model, system=None):
+        queries.append(query)
+        return True, f"Q: Which chunk?\nA: {query.split()[-1]}"
+    
+    monkeypatch.setattr(llm_module, "aget_llm_completion", fake_completion)
+    chunks = ["Footer text one", "Body text two", "Footer text one"]
+    results = llm_processor.process_text_bulk(chunks, mode="concurrent")
+    assert len(queries) == 2, "The repeated chunk should not be sent again"
+    assert results == [[("Which chunk?", "one")], [("Which chunk?", "two")], [("Which chunk?", "one")]], \
+        "Duplicates should get the cards of their first occurrence"
+    assert results[0] is not results[2], "Duplicate positions should get separate lists"
+
+def test_bulk_completions_bounded(monkeypatch):
+    """Test that bulk completions keep input order and respect the concurrency limit."""
+    from utils import llm_utils
+    in_flight = []
+    peak = []
+    
+    async def fake_completion(query, model, system=None):
+        in_flight.append(query)
+        peak.append(len(in_flight))
+        await asyncio.sleep(0.01)
+        in_flight.remove(query)
+        return True, query.upper()
+    
+    monkeypatch.setattr(llm_utils, "aget_llm_completion", fake_completion)
+    results = llm_utils.get_llm_completions_bulk(["a", "b", "c", "d", "e"], max_concurrency=2)
+    assert results == [(True, "A"), (True, "B"), (True, "C"), (True, "D"), (True, "E")], \
+        "Results should be returned in input order"
+    assert max(peak) == 2, "No more than max_concurrency requests should be in flight"
+
+def test_completion_cache(monkeypatch, tmp_path):
+    """Test that opted-in completions are served from the local cache on repeat."""
+    from utils import llm_utils
+    calls = []
+    
+    def fake_openai(query, model, system=None):
+        calls.append(query)
+        return [], True, f"answer {len(calls)}"
+    
+    cache = LLMCache(db_path=str(tmp_path / "completions.db"))
+    monkeypatch.setattr(llm_utils, "_response_cache", cache)
+    monkeypatch.setattr(llm_utils, "_DEFAULT_ROUTE", (fake_openai, False))
+    assert llm_utils.get_llm_completion("Hi", use_cache=True) == (True, "answer 1")
+    assert llm_utils.get_llm_completion("Hi", use_cache=True) == (True, "answer 1"), \
+        "A repeated request should be served from the cache"
+    assert llm_utils.get_llm_completion("Hi") == (True, "answer 2"), "Requests not opting in should bypass the cache"
+    assert len(calls) == 2
+    cache.close()
+
+def test_image_fetch_cached(monkeypatch):
+    """Test that image downloads are cached per URL within a size budget and typed by extension."""
+    import httpx
+    from collections import OrderedDict
+    from utils import llm_utils
+    requests = []
+    
+    def handler(request):
+        requests.append(str(request.url))
+        return httpx.Response(200, content=b"image bytes")  # 16 base64 characters
+    
+    monkeypatch.setattr(llm_utils, "http_client", httpx.Client(transport=httpx.MockTransport(handler)))
+    monkeypatch.setattr(llm_utils, "_image_cache", OrderedDict())
+    monkeypatch.setattr(llm_utils, "_image_cache_chars", 0)
+    monkeypatch.setattr(llm_utils, "IMAGE_CACHE_CHARS", 32)
+    url = "https://example.com/photo.WEBP?size=large"
+    first = llm_utils._fetch_image_base64(url)
+    assert first[0] == "image/webp", "Media type should come from the extension when the server sends none"
+    assert llm_utils._fetch_image_base64(url) == first
+    assert len(requests) == 1, "A repeated image should not be downloaded again"
+    
+    llm_utils._fetch_image_base64("https://example.com/b.png")
+    llm_utils._fetch_image_base64("https://example.com/c.png")
+    assert list(llm_utils._image_cache) == ["https://example.com/b.png", "https://example.com/c.png"], \
+        "The least recently used image should be evicted once the size budget is exceeded"
+    assert llm_utils._image_cache_chars == 32
+
+def test_qa_response_parsing():
+    """Test parsing Q&A blocks, including multi-line answers and unanswered questions."""
+    response = (
+        "Here are your cards:\n\n"
+        "Q: What is Python?\n"
+        "A: A programming language\n"
+        "used for scripting\n\n"
+        "Q: Dangling question\n"
+        "  Q: Who created Python?\n"
+        "  A: Guido van Rossum"
+    )
+    assert parse_qa_response(response) == [
+        ("What is Python?", "A programming language\nused for scripting"),
+        ("Who created Python?", "Guido van Rossum"),
+    ], "Should parse every answered question block"
+
+def test_cloze_response_parsing():
+    """Test parsing and repairing cloze cards from a raw LLM response."""
+    response = (
+        "Text: {c1::Python} was created in {c2::1991}.\n"
+        "Extra: Guido van Rossum\n"
+        "Text: No deletion here.\n"
+        "Extra: Should be dropped"
+    )
+    items = validate_cloze_items(parse_cloze_response(response))
+    assert items == [("{{c1::Python}} was created in {{c2::1991}}.", "Guido van Rossum")], \
+        "Single braces should be repaired and cards without deletions dropped"
+
+def test_text_chunking(llm_processor):
+    """Test splitting long text into chunks on paragraph boundaries."""
+    paragraphs = [f"Paragraph {i} " + "word " * 50 for i in range(20)]
+    text = "\n\n".join(paragraphs)
+    chunks = llm_processor.split_text(text, max_chars=1000)
+    assert len(chunks) > 1, "Long text should be split into several chunks"
+    assert all(len(chunk) <= 1000 for chunk in chunks), "Chunks should respect the size limit"
+    assert "\n\n".join(chunks) == text, "Chunks should preserve the original text"
+
+def test_token_chunking(llm_processor):
+    """Test token windows overlap and cover the whole text."""
+    import re
+    
+    class WordEncoder:
+        """Stand-in for a tiktoken encoding with one token per word (and its leading space)."""
+        def encode(self, text, disallowed_special="all"):
+            return re.findall(r" ?[^ ]+", text)
+        
+        def decode_tokens_bytes(self, tokens):
+            return [token.encode("utf-8") for token in tokens]
+    
+    llm_processor._encoder = WordEncoder()
+    llm_processor._encoder_model = llm_processor.model
+    words = [f"w{i}" for i in range(250)]
+    chunks = llm_processor.split_text_tokens(" ".join(words), max_tokens=100, overlap=10)
+    assert [chunk.split()[0] for chunk in chunks] == ["w0", "w90", "w180"], "Windows should overlap by 10 tokens"
+    assert chunks[-1].split()[-1] == "w249", "The last window should reach the end of the text"
+    assert llm_processor.split_text_tokens("short text", max_tokens=100) == ["short text"]
+
+def test_token_chunking_special_token_text(llm_processor):
+    """Test that text spelling out a special token is chunked as ordinary text."""
+    tiktoken = pytest.importorskip("tiktoken")
+    # A tiny byte-level encoding that needs no download
+    encoder = tiktoken.Encoding(
+        name="test_bytes",
+        pat_str=r"\S+|\s+",
+        mergeable_ranks={bytes([i]): i for i in range(256)},
+        special_tokens={"<|endoftext|>": 256}
+    )
+    llm_processor._encoder = encoder
+    llm_processor._encoder_model = llm_processor.model
+    text = "Sequences end with <|endoftext|> during pretraining. " * 10
+    chunks = llm_processor.split_text_tokens(text, max_tokens=100, overlap=0)
+    assert "".join(chunks) == text, "Special token strings should be split like any other text"
+
+def test_token_chunking_multibyte(llm_processor):
+    """Test that token windows never cut a multibyte character in half."""
+    class ByteEncoder:
+        """Stand-in for a byte-level encoding with one token per UTF-8 byte."""
+        def encode(self, text, disallowed_special="all"):
+            return list(text.encode("utf-8"))
+        
+        def decode_tokens_bytes(self, tokens):
+            return [bytes([token]) for token in tokens]
+    
+    llm_processor._encoder = ByteEncoder()
+    llm_processor._encoder_model = llm_processor.model
+    text = "né€😀" * 20
+    chunks = llm_processor.split_text_tokens(text, max_tokens=7, overlap=0)
+    assert "\ufffd" not in "".join(chunks), "Window edges should not produce replacement characters"
+    assert "".join(chunks) == text, "Windows without overlap should cover the text exactly once"
+
+def test_llm_cache_round_trip():
+    """Test exact-match caching of LLM results."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = LLMCache(db_path=os.path.join(tmpdir, "cache.db"))
+        qa_pairs = [["What is Python?", "A programming language"]]
+        cache.set("gpt-4o", "prompt {text}", "some text", qa_pairs)
+        assert cache.get("gpt-4o", "prompt {text}", "some text") == qa_pairs, "Should return cached result"
+        assert cache.get("gpt-4o", "prompt {text}", "other text") is None, "Different text should miss"
+        assert cache.get("sonar-pro", "prompt {text}", "some text") is None, "Different model should miss"
+        cache.close()
+
+def test_llm_cache_semantic_scoped_to_prompt(tmp_path):
+    """Test that semantic hits need the same prompt and are not decided by a long shared prompt."""
+    np = pytest.importorskip("numpy")
+    
+    class TruncatingEncoder:
+        """Stand-in for a sentence model that only reads its first few words."""
+        def encode(self, text, normalize_embeddings=True):
+            seed = sum(map(ord, " ".join(text.split()[:20])))
+            vector = np.random.default_rng(seed).standard_normal(32)
+            return vector / np.linalg.norm(vector)
+    
+    cache = LLMCache(db_path=str(tmp_path / "cache.db"), semantic=True)
+    cache._encoder = TruncatingEncoder()
+    prompt = "Create flashcards from the following text, covering every key fact. " * 5
+    text = "Mitochondria produce most of the cell's ATP through oxidative phosphorylation. " * 3
+    cache.set("gpt-4o", prompt, text, [["Q1", "A1"]])
+    assert cache.get("gpt-4o", prompt, "The French Revolution began in 1789.") is None, \
+        "A different text with the same prompt should miss"
+    assert cache.get("gpt-4o", prompt, text + "Extra trailing words.") == [["Q1", "A1"]], \
+        "A near-identical text with the same prompt should hit"
+    assert cache.get("gpt-4o", "Other prompt", text + "Extra trailing words.") is None, \
+        "The same text under a different prompt should miss"
+    cache.close()
+
+def test_prompt_split_for_caching(llm_processor):
+    """Test that prompt templates split into a shared system prompt and a per-text message."""
+    prompt = llm_processor.get_prompt_template("standard")
+    system_a, user_a = split_prompt(prompt, "First chunk {braces}")
+    system_b, user_b = split_prompt(prompt, "Second chunk")
+    assert system_a == system_b, "The instructions should be identical for every chunk"
+    assert system_a.startswith("Given the following text") and not system_a.endswith("Text:")
+    assert user_a == "Text:\nFirst chunk {braces}", "The text should follow its label in the user message"
+    assert split_prompt("{text}", "Only text") == ("", "Only text")
+
+def test_bulk_batch_resumes_interrupted_job(monkeypatch):
+    """Test that a Batch API job ID survives an interrupted run and is resumed."""
+    import llm_processor as llm_module
+    calls = []
+    
+    def interrupted(queries, model, poll_interval, batch_id, on_submit, system=None, cancel_event=None):
+        calls.append(batch_id)
+        on_submit("batch-123")
+        return [(False, "connection lost")] * len(queries)
+    
+    def finished(queries, model, poll_interval, batch_id, on_submit, system=None, cancel_event=None):
+        calls.append(batch_id)
+        return [(True, "Q: What is Python?\nA: A programming language")] * len(queries)
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        processor = LLMProcessor(cache=LLMCache(db_path=os.path.join(tmpdir, "cache.db")))
+        monkeypatch.setattr(llm_module, "get_llm_batch_completion", interrupted)
+        assert processor.process_text_bulk(["Python text"]) == [[]]
+        
+        monkeypatch.setattr(llm_module, "get_llm_batch_completion", finished)
+        results = processor.process_text_bulk(["Python text"])
+        assert calls == [None, "batch-123"], "The second run should resume the submitted batch"
+        assert results == [[("What is Python?", "A programming language")]]
+        assert processor.process_text_bulk(["Python text"]) == results, "Results should then come from the cache"
+        assert len(calls) == 2, "Cached texts should not be resubmitted"
+        processor.cache.close()
+
+def test_bulk_batch_cancelled_wait_keeps_job(monkeypatch):
+    """Test that cancelling the wait for a Batch API job stops polling and keeps its ID for the next run."""
+    import threading
+    from types import SimpleNamespace
+    from utils import llm_utils
+    
+    pending = SimpleNamespace(id="batch-123", status="in_progress")
+    fake_client = SimpleNamespace(batches=SimpleNamespace(retrieve=lambda batch_id: pending))
+    monkeypatch.setattr(llm_utils, "openai_client", fake_client)
+    cancel_event = threading.Event()
+    cancel_event.set()
+    
+    with tempfile.TemporaryDirectory() as tmpdir:
+        processor = LLMProcessor(cache=LLMCache(db_path=os.path.join(tmpdir, "cache.db")))
+        resumed = []
+        monkeypatch.setattr(processor.cache, "get_batch_id", lambda job_hash: resumed.append(job_hash) or "batch-123")
+        forgotten = []
+        monkeypatch.setattr(processor.cache, "set_batch_id", lambda job_hash, batch_id: forgotten.append(batch_id))
+        assert processor.process_text_bulk(["Python text"], poll_interval=3600, cancel_event=cancel_event) == [[]], \
+            "A cancelled wait should return promptly without cards"
+        assert resumed and not forgotten, "The batch ID should be kept so the next run resumes the job"
+        processor.cache.close()
+
+def test_pipelined_pdf_processing(pdf_processor, llm_processor, monkeypatch):
+    """Test that page batches stream into the LLM and results come back in page order."""
+    import llm_processor as llm_module
+    
+    async def fake_completion(query, model, system=None):
+        # Finish later batches first to exercise the reordering
+        first_page = int(query.split("Page ", 1)[1].split()[0])
+        await asyncio.sleep(0.05 / first_page)
+        return True, f"Q: Which page?\nA: {first_page}"
+    
+    monkeypatch.setattr(llm_module, "aget_llm_completion", fake_completion)
+    pdf_path = make_pdf(12)
+    try:
+        qa_pairs = process_pdf_pipelined(pdf_processor, llm_processor, pdf_path, batch_pages=5, workers=3)
+        assert [answer for _, answer in qa_pairs] == ["1", "6", "11"], "Batches should be returned in page order"
+    finally:
+        os.unlink(pdf_path)
+
+def test_pipelined_pdf_processing_survives_errors(pdf_processor, llm_processor, monkeypatch):
+    """Test that a failing LLM call skips its batch instead of stalling the pipeline."""
+    import threading
+    import llm_processor as llm_module
+    
+    async def flaky_process_text(text, custom_prompt=None, text_hash=None):
+        page = int(text.split("Page ", 1)[1].split()[0])
+        if page == 1:
+            raise RuntimeError("LLM request failed")
+        return [("Which page?", str(page))]
+    
+    monkeypatch.setattr(llm_processor, "aprocess_text", flaky_process_text)
+    pdf_path = make_pdf(40)
+    try:
+        results = []
+        worker = threading.Thread(
+            target=lambda: results.append(
+                process_pdf_pipelined(pdf_processor, llm_processor, pdf_path, batch_pages=1, workers=1)
+            ),
+            daemon=True
+        )
+        worker.start()
+        worker.join(timeout=60)
+        assert not worker.is_alive(), "The pipeline should not hang after a failed batch"
+        assert [answer for _, answer in results[0]] == [str(page) for page in range(2, 41)], \
+            "Every other batch should still be processed in page order"
+    finally:
+        pdf_processor.close()
+        os.unlink(pdf_path)
+
 def test_custom_prompt(llm_processor):
     """Test custom prompt processing."""
     custom_prompt = """
@@ -0,0 +1,222 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".pdftoanki", "cache.db")
+
+# Amount of source text embedded for semantic lookups
+SEMANTIC_TEXT_CHARS = 2048
+
+class LLMCache:
+    """
+    SQLite-backed cache of parsed LLM results.
+
+    Exact hits are keyed on a hash of (model, prompt, text) and an optional
+    kind separating results parsed differently from the same request. When semantic
+    lookups are enabled and sentence-transformers is installed, texts whose
+    embedding is close enough to one cached for the same model and prompt
+    are also treated as hits.
+    """
+
+    def __init__(self, db_path=DEFAULT_CACHE_PATH, ttl_days=30, max_entries=1000,
+                 semantic=False, similarity_threshold=0.92):
+        """
+        Open (or create) the cache database.
+
+        Args:
+            db_path (str): Path to the SQLite file
+            ttl_days (int): Entries older than this are discarded
+            max_entries (int): Least recently used entries beyond this are evicted
+            semantic (bool): Whether to look up near-duplicate texts by embedding
+            similarity_threshold (float): Minimum cosine similarity for a semantic hit
+        """
+        self.ttl_seconds = ttl_days * 24 * 60 * 60
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity_threshold = similarity_threshold
+        self._encoder = None
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS responses (
+                key_hash BLOB PRIMARY KEY,
+                model TEXT,
+                embedding BLOB,
+                response TEXT,
+                ts INTEGER,
+                prompt_hash TEXT
+            )"""
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        if "prompt_hash" not in columns:
+            # Databases from before semantic lookups were scoped to the prompt;
+            # their rows get no prompt hash and so never match semantically
+            self._conn.execute("ALTER TABLE responses ADD COLUMN prompt_hash TEXT")
+        # Provider batch jobs still in flight, so they can be resumed after a restart
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS batches (
+                job_hash TEXT PRIMARY KEY,
+                batch_id TEXT,
+                ts INTEGER
+            )"""
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def prompt_hash(prompt, kind=""):
+        """Return the sha256 hex digest identifying a (prompt, kind) pair in semantic lookups."""
+        payload = json.dumps([prompt, kind]) if kind else prompt
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def cache_key(model, prompt, text, text_hash=None, kind=""):
+        """
+        Return the exact-match key for a (model, prompt, text) triple.
+
+        Args:
+            text_hash (str): Precomputed sha256 hex digest of text, if available
+            kind (str): Kind of result stored (e.g. a card type); results of
+                different kinds never share a key
+        """
+        if text_hash is None:
+            text_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        payload = json.dumps([model, prompt, text_hash] + ([kind] if kind else []))
+        return hashlib.sha256(payload.encode("utf-8")).digest()
+
+    def get(self, model, prompt, text, text_hash=None, kind=""):
+        """
+        Look up a cached result of the given kind (see cache_key).
+
+        Returns:
+            The cached result, or None on a miss
+        """
+        try:
+            key = self.cache_key(model, prompt, text, text_hash, kind)
+            now = int(time.time())
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response, ts FROM responses WHERE key_hash = ?", (key,)
+                ).fetchone()
+                if row and now - row[1] <= self.ttl_seconds:
+                    # Touch the entry so LRU eviction keeps it
+                    self._conn.execute("UPDATE responses SET ts = ? WHERE key_hash = ?", (now, key))
+                    self._conn.commit()
+                    logger.info("LLM cache hit")
+                    return json.loads(row[0])
+
+            return self._get_semantic(model, prompt, text, now, kind)
+        except Exception as e:
+            logger.error(f"Error reading LLM cache: {e}")
+            return None
+
+    def set(self, model, prompt, text, response, text_hash=None, kind=""):
+        """Store a result of the given kind and evict expired or least recently used entries."""
+        try:
+            key = self.cache_key(model, prompt, text, text_hash, kind)
+            embedding = self._embed(text)
+            now = int(time.time())
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses (key_hash, model, embedding, response, ts, prompt_hash) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, model, embedding.tobytes() if embedding is not None else None,
+                     json.dumps(response), now, self.prompt_hash(prompt, kind))
+                )
+                self._conn.execute("DELETE FROM responses WHERE ts < ?", (now - self.ttl_seconds,))
+                self._conn.execute(
+                    """DELETE FROM responses WHERE key_hash NOT IN (
+                        SELECT key_hash FROM responses ORDER BY ts DESC LIMIT ?
+                    )""",
+                    (self.max_entries,)
+                )
+                self._conn.commit()
+        except Exception as e:
+            logger.error(f"Error writing LLM cache: {e}")
+
+    def get_batch_id(self, job_hash):
+        """Return the provider batch ID recorded for a job, or None."""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT batch_id FROM batches WHERE job_hash = ?", (job_hash,)
+                ).fetchone()
+            return row[0] if row else None
+        except Exception as e:
+            logger.error(f"Error reading batch ID: {e}")
+            return None
+
+    def set_batch_id(self, job_hash, batch_id):
+        """Record the provider batch ID for a job, or forget it if batch_id is None."""
+        try:
+            with self._lock:
+                if batch_id is None:
+                    self._conn.execute("DELETE FROM batches WHERE job_hash = ?", (job_hash,))
+                else:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO batches VALUES (?, ?, ?)",
+                        (job_hash, batch_id, int(time.time()))
+                    )
+                self._conn.commit()
+        except Exception as e:
+            logger.error(f"Error writing batch ID: {e}")
+
+    def close(self):
+        """Close the underlying database connection."""
+        with self._lock:
+            self._conn.close()
+
+    def _get_encoder(self):
+        """Lazily load the sentence embedding model, disabling semantic lookups if unavailable."""
+        if self._encoder is None and self.semantic:
+            try:
+                from sentence_transformers import SentenceTransformer
+                self._encoder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+            except ImportError:
+                logger.info("sentence-transformers not installed, semantic cache disabled")
+                self.semantic = False
+        return self._encoder
+
+    def _embed(self, text):
+        """
+        Return a normalized float32 embedding of the leading text, or None.
+
+        The prompt is left out: the model only reads the first few hundred
+        word pieces, which a long shared prompt would fill.
+        """
+        encoder = self._get_encoder()
+        if encoder is None:
+            return None
+        return encoder.encode(text[:SEMANTIC_TEXT_CHARS], normalize_embeddings=True).astype("float32")
+
+    def _get_semantic(self, model, prompt, text, now, kind=""):
+        """Return the closest result cached for the same model, prompt and kind above the similarity threshold, or None."""
+        embedding = self._embed(text)
+        if embedding is None:
+            return None
+
+        import numpy as np
+
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT embedding, response FROM responses "
+                "WHERE model = ? AND prompt_hash = ? AND embedding IS NOT NULL AND ts >= ?",
+                (model, self.prompt_hash(prompt, kind), now - self.ttl_seconds)
+            ).fetchall()
+        if not rows:
+            return None
+
+        matrix = np.frombuffer(b"".join(row[0] for row in rows), dtype=np.float32)
+        similarities = matrix.reshape(len(rows), -1) @ embedding
+        best = int(similarities.argmax())
+        if similarities[best] >= self.similarity_threshold:
+            logger.info(f"LLM semantic cache hit (similarity {similarities[best]:.3f})")
+            return json.loads(rows[best][1])
+        return None
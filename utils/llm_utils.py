@@ -1,12 +1,18 @@
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
 from rich.markdown import Markdown
 from rich.console import Console
-from anthropic import Anthropic
+from anthropic import Anthropic, AsyncAnthropic
+import asyncio
 import base64
 import httpx
+import json
 import os
 import logging
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
 
 # Load environment variables
 load_dotenv()
@@ -18,15 +24,74 @@ perplexity_client = OpenAI(
     base_url="https://api.perplexity.ai"
 )
 claude_client = Anthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
+
+# Async clients for non-blocking calls from an event loop
+async_openai_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+async_perplexity_client = AsyncOpenAI(
+    api_key=os.getenv('PERPLEXITY_API_KEY'), 
+    base_url="https://api.perplexity.ai"
+)
+async_claude_client = AsyncAnthropic(api_key=os.getenv('ANTHROPIC_API_KEY'))
 console = Console()
 
-def get_openai_completion(messages, model="gpt-4o"):
+# Shared HTTP client for image downloads, so repeat fetches reuse connections
+http_client = httpx.Client(timeout=30.0, follow_redirects=True)
+
+# Raw completions cached by get_llm_completion(..., use_cache=True)
+RESPONSE_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".pdftoanki", "completions.db")
+_response_cache = None
+
+def _get_response_cache():
+    """Lazily open the completion cache, so importing this module touches no files."""
+    global _response_cache
+    if _response_cache is None:
+        from utils.llm_cache import LLMCache
+        _response_cache = LLMCache(db_path=RESPONSE_CACHE_PATH)
+    return _response_cache
+
+def _cache_args(query, model, system):
+    """LLMCache (model, prompt, text) arguments identifying a completion request."""
+    return model, system or "", json.dumps(query, sort_keys=True)
+
+def _add_system_prompt(messages, system, native=True):
+    """
+    Add a system prompt to a message list.
+    
+    Args:
+        messages (list): Message dictionaries
+        system (str): System prompt, or None
+        native (bool): Whether the model accepts system messages; if not, the
+            prompt is prepended to the first user message instead
+        
+    Returns:
+        list: The message list with the system prompt applied
+    """
+    if not system:
+        return messages
+    if native:
+        return [{"role": "system", "content": system}] + messages
+    messages = list(messages)
+    for i, msg in enumerate(messages):
+        if msg["role"] == "user":
+            messages[i] = {"role": "user", "content": f"{system}\n\n{msg['content']}"}
+            break
+    return messages
+
+def _claude_system(system):
+    """Claude system blocks for a system prompt, marked as a prompt-cache breakpoint."""
+    if not system:
+        return []
+    return [{"type": "text", "text": system, "cache_control": {"type": "ephemeral"}}]
+
+def get_openai_completion(messages, model="gpt-4o", system=None):
     """
     Get completion from OpenAI models.
     
     Args:
         messages (list or str): List of message dictionaries or a single string query
         model (str): OpenAI model identifier
+        system (str): Optional system prompt, sent first so OpenAI's automatic
+            prefix caching can reuse it across calls
         
     Returns:
         tuple: (updated_messages, success, response/error_message)
@@ -37,6 +102,7 @@ def get_openai_completion(messages, model="gpt-4o"):
     try:
         if model != "gpt-4o":
             messages = [msg for msg in messages if msg["role"] != "system"]
+        messages = _add_system_prompt(messages, system, native=model == "gpt-4o")
 
         response = openai_client.chat.completions.create(
             model=model,
@@ -51,7 +117,7 @@ def get_openai_completion(messages, model="gpt-4o"):
     except Exception as e:
         return messages, False, str(e)
 
-def get_perplexity_completion(messages, model="sonar-pro", stream=False):
+def get_perplexity_completion(messages, model="sonar-pro", stream=False, system=None):
     """
     Get completion from Perplexity models.
     
@@ -59,6 +125,7 @@ def get_perplexity_completion(messages, model="sonar-pro", stream=False):
         messages (list or str): List of message dictionaries or a single string query
         model (str): Perplexity model name
         stream (bool): Whether to stream the response
+        system (str): Optional system prompt, prepended to the first user message
         
     Returns:
         tuple: (updated_messages, success, response/error_message)
@@ -68,6 +135,7 @@ def get_perplexity_completion(messages, model="sonar-pro", stream=False):
 
     # Filter out system messages as Perplexity might not handle them
     messages = [msg for msg in messages if msg["role"] != "system"]
+    messages = _add_system_prompt(messages, system, native=False)
 
     params = {
         "model": model,
@@ -87,13 +155,14 @@ def get_perplexity_completion(messages, model="sonar-pro", stream=False):
     except Exception as e:
         return messages, False, str(e)
 
-def get_claude_completion(messages, model="claude-3-7-sonnet-latest"):
+def get_claude_completion(messages, model="claude-3-7-sonnet-latest", system=None):
     """
     Get completion from Claude models.
     
     Args:
         messages (list or str): List of message dictionaries or a single string query
         model (str): Claude model identifier
+        system (str): Optional system prompt, marked as a prompt-cache breakpoint
         
     Returns:
         tuple: (updated_messages, success, response/error_message)
@@ -108,6 +177,7 @@ def get_claude_completion(messages, model="claude-3-7-sonnet-latest"):
         response = claude_client.messages.create(
             model=model,
             max_tokens=4000,  # Increased max tokens for longer responses
+            system=_claude_system(system),
             messages=[msg for msg in messages if msg["role"] != "system"]
         )
         
@@ -124,7 +194,33 @@ def get_claude_completion(messages, model="claude-3-7-sonnet-latest"):
         logger.error(traceback.format_exc())
         return messages, False, str(e)
 
-def get_llm_completion(query, model="gpt-4o", stream=False):
+# (model prefix, handler, handler takes a stream argument), checked in order;
+# models matching no prefix go to OpenAI
+_ROUTES = (
+    ("claude", get_claude_completion, False),
+    ("sonar", get_perplexity_completion, True),
+)
+_DEFAULT_ROUTE = (get_openai_completion, False)
+
+def _route(routes, model, default=None):
+    """
+    Look up the provider route for a model.
+    
+    Args:
+        routes (tuple): (prefix, handler, ...) entries
+        model (str): Model identifier
+        default (tuple): Route used when no prefix matches; defaults to
+            _DEFAULT_ROUTE
+        
+    Returns:
+        tuple: The matching entry without its prefix, e.g. (handler, streams)
+    """
+    for prefix, *route in routes:
+        if model.startswith(prefix):
+            return tuple(route)
+    return default or _DEFAULT_ROUTE
+
+def get_llm_completion(query, model="gpt-4o", stream=False, system=None, use_cache=False):
     """
     Unified interface for getting completions from OpenAI, Perplexity, or Claude models.
     
@@ -132,24 +228,427 @@ def get_llm_completion(query, model="gpt-4o", stream=False):
         query (str or list): User query or message list
         model (str): Model identifier (e.g., "gpt-4o", "sonar-pro", "claude-3-sonnet")
         stream (bool): Whether to stream the response (Perplexity only)
+        system (str): Optional constant system prompt; kept separate from the
+            query so providers can cache it as a prompt prefix
+        use_cache (bool): Serve identical (model, system, query) requests from
+            a local SQLite cache and store successful responses in it;
+            ignored when streaming
         
     Returns:
         tuple: (success, response/error_message)
     """
-    # Claude models
-    if model.startswith("claude"):
-        messages, success, response = get_claude_completion(query, model)
-        return success, response
+    use_cache = use_cache and not stream
+    if use_cache:
+        cached = _get_response_cache().get(*_cache_args(query, model, system))
+        if cached is not None:
+            return True, cached
     
-    # Perplexity models
-    elif model.startswith("sonar"):
-        messages, success, response = get_perplexity_completion(query, model, stream)
-        return success, response
+    handler, streams = _route(_ROUTES, model)
+    if streams:
+        messages, success, response = handler(query, model, stream, system)
+    else:
+        messages, success, response = handler(query, model, system=system)
     
-    # OpenAI models
+    if use_cache and success:
+        _get_response_cache().set(*_cache_args(query, model, system), response)
+    return success, response
+
+async def aget_openai_completion(messages, model="gpt-4o", system=None):
+    """
+    Async variant of get_openai_completion.
+    
+    Args:
+        messages (list or str): List of message dictionaries or a single string query
+        model (str): OpenAI model identifier
+        system (str): Optional system prompt, sent first so OpenAI's automatic
+            prefix caching can reuse it across calls
+        
+    Returns:
+        tuple: (updated_messages, success, response/error_message)
+    """
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+
+    try:
+        if model != "gpt-4o":
+            messages = [msg for msg in messages if msg["role"] != "system"]
+        messages = _add_system_prompt(messages, system, native=model == "gpt-4o")
+
+        response = await async_openai_client.chat.completions.create(
+            model=model,
+            messages=messages
+        )
+        
+        ai_response = response.choices[0].message.content
+        messages.append({"role": "assistant", "content": ai_response})
+        
+        return messages, True, ai_response
+        
+    except Exception as e:
+        return messages, False, str(e)
+
+async def aget_perplexity_completion(messages, model="sonar-pro", system=None):
+    """
+    Async variant of get_perplexity_completion (non-streaming only).
+    
+    Args:
+        messages (list or str): List of message dictionaries or a single string query
+        model (str): Perplexity model name
+        system (str): Optional system prompt, prepended to the first user message
+        
+    Returns:
+        tuple: (updated_messages, success, response/error_message)
+    """
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+
+    # Filter out system messages as Perplexity might not handle them
+    messages = [msg for msg in messages if msg["role"] != "system"]
+    messages = _add_system_prompt(messages, system, native=False)
+
+    try:
+        response = await async_perplexity_client.chat.completions.create(
+            model=model,
+            messages=messages,
+            temperature=0.2
+        )
+        
+        ai_response = response.choices[0].message.content
+        messages.append({"role": "assistant", "content": ai_response})
+        return messages, True, ai_response
+    except Exception as e:
+        return messages, False, str(e)
+
+async def aget_claude_completion(messages, model="claude-3-7-sonnet-latest", system=None):
+    """
+    Async variant of get_claude_completion.
+    
+    Args:
+        messages (list or str): List of message dictionaries or a single string query
+        model (str): Claude model identifier
+        system (str): Optional system prompt, marked as a prompt-cache breakpoint
+        
+    Returns:
+        tuple: (updated_messages, success, response/error_message)
+    """
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    
+    logger = logging.getLogger(__name__)
+    try:
+        logger.info(f"Sending async request to Claude API with model: {model}")
+        
+        response = await async_claude_client.messages.create(
+            model=model,
+            max_tokens=4000,
+            system=_claude_system(system),
+            messages=[msg for msg in messages if msg["role"] != "system"]
+        )
+        
+        ai_response = response.content[0].text
+        messages.append({"role": "assistant", "content": ai_response})
+        
+        logger.info(f"Successfully received response from Claude API, length: {len(ai_response)}")
+        return messages, True, ai_response
+        
+    except Exception as e:
+        logger.error(f"Error in Claude API call: {str(e)}")
+        return messages, False, str(e)
+
+# Async counterparts of _ROUTES as (model prefix, handler); async
+# completions never stream
+_AROUTES = (
+    ("claude", aget_claude_completion),
+    ("sonar", aget_perplexity_completion),
+)
+
+async def aget_llm_completion(query, model="gpt-4o", system=None, use_cache=False):
+    """
+    Async variant of get_llm_completion, so callers can await network I/O
+    without blocking a GUI thread.
+    
+    Args:
+        query (str or list): User query or message list
+        model (str): Model identifier (e.g., "gpt-4o", "sonar-pro", "claude-3-sonnet")
+        system (str): Optional constant system prompt (see get_llm_completion)
+        use_cache (bool): Use the local completion cache (see get_llm_completion)
+        
+    Returns:
+        tuple: (success, response/error_message)
+    """
+    if use_cache:
+        cached = _get_response_cache().get(*_cache_args(query, model, system))
+        if cached is not None:
+            return True, cached
+    
+    handler = _route(_AROUTES, model, (aget_openai_completion,))[0]
+    messages, success, response = await handler(query, model, system=system)
+    
+    if use_cache and success:
+        _get_response_cache().set(*_cache_args(query, model, system), response)
+    return success, response
+
+async def aget_llm_completions_bulk(queries, model="gpt-4o", system=None, max_concurrency=6):
+    """
+    Run several completions concurrently over the shared async clients.
+    
+    Args:
+        queries (list): User queries or message lists
+        model (str): Model identifier (e.g., "gpt-4o", "sonar-pro", "claude-3-sonnet")
+        system (str): Optional system prompt shared by every query
+        max_concurrency (int): Maximum number of requests in flight at once,
+            to stay within provider rate limits
+        
+    Returns:
+        list: (success, response/error_message) tuples in input order
+    """
+    # Created per call so it is bound to the running event loop
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def bounded(query):
+        async with semaphore:
+            return await aget_llm_completion(query, model, system)
+    
+    return list(await asyncio.gather(*(bounded(query) for query in queries)))
+
+def get_llm_completions_bulk(queries, model="gpt-4o", system=None, max_concurrency=6):
+    """
+    Blocking wrapper around aget_llm_completions_bulk.
+    
+    Must not be called from a running event loop.
+    
+    Returns:
+        list: (success, response/error_message) tuples in input order
+    """
+    return asyncio.run(aget_llm_completions_bulk(queries, model, system, max_concurrency))
+
+def supports_batch_api(model):
+    """Return True if the model's provider offers an asynchronous Batch API."""
+    return not model.startswith("sonar")
+
+def _submit_openai_batch(queries, model, system=None):
+    """Upload queries as a JSONL file and create an OpenAI batch job for them."""
+    lines = [
+        json.dumps({
+            "custom_id": f"chunk-{i}",
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model,
+                "messages": _add_system_prompt([{"role": "user", "content": query}], system,
+                                               native=model == "gpt-4o")
+            }
+        })
+        for i, query in enumerate(queries)
+    ]
+    batch_file = openai_client.files.create(
+        file=("batch.jsonl", "\n".join(lines).encode("utf-8")),
+        purpose="batch"
+    )
+    return openai_client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+
+def _wait_for_poll(poll_interval, cancel_event=None):
+    """
+    Wait between batch status checks.
+    
+    Args:
+        poll_interval (int): Seconds to wait
+        cancel_event (threading.Event): Optional event that ends the wait early
+        
+    Returns:
+        bool: True if cancel_event was set, so polling should stop
+    """
+    if cancel_event is None:
+        time.sleep(poll_interval)
+        return False
+    return cancel_event.wait(poll_interval)
+
+def get_openai_batch_completion(queries, model="gpt-4o", poll_interval=30, batch_id=None, on_submit=None,
+                                system=None, cancel_event=None):
+    """
+    Run queries through the OpenAI Batch API and wait for the results.
+    
+    Args:
+        queries (list): List of string queries
+        model (str): OpenAI model identifier
+        poll_interval (int): Seconds to wait between status checks
+        batch_id (str): ID of an already submitted batch for these queries to resume
+        on_submit (callable): Called with the new batch ID once a batch is created
+        system (str): Optional system prompt shared by every query
+        cancel_event (threading.Event): Optional event that stops polling early
+        
+    Returns:
+        list: (success, response/error_message) tuples in input order
+    """
+    if batch_id:
+        batch = openai_client.batches.retrieve(batch_id)
     else:
-        messages, success, response = get_openai_completion(query, model)
-        return success, response
+        batch = _submit_openai_batch(queries, model, system)
+        if on_submit:
+            on_submit(batch.id)
+    
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        if _wait_for_poll(poll_interval, cancel_event):
+            return [(False, f"Stopped waiting for batch {batch.id}")] * len(queries)
+        batch = openai_client.batches.retrieve(batch.id)
+    
+    results = [(False, f"Batch {batch.id} finished with status {batch.status}")] * len(queries)
+    for file_id in (batch.output_file_id, batch.error_file_id):
+        if not file_id:
+            continue
+        for line in openai_client.files.content(file_id).text.splitlines():
+            item = json.loads(line)
+            index = int(item["custom_id"].split("-", 1)[1])
+            response = item.get("response") or {}
+            if item.get("error") or response.get("status_code") != 200:
+                results[index] = (False, str(item.get("error") or response.get("body")))
+            else:
+                results[index] = (True, response["body"]["choices"][0]["message"]["content"])
+    return results
+
+def get_claude_batch_completion(queries, model="claude-3-7-sonnet-latest", poll_interval=30,
+                                batch_id=None, on_submit=None, system=None, cancel_event=None):
+    """
+    Run queries through Anthropic Message Batches and wait for the results.
+    
+    Args:
+        queries (list): List of string queries
+        model (str): Claude model identifier
+        poll_interval (int): Seconds to wait between status checks
+        batch_id (str): ID of an already submitted batch for these queries to resume
+        on_submit (callable): Called with the new batch ID once a batch is created
+        system (str): Optional system prompt shared by every query
+        cancel_event (threading.Event): Optional event that stops polling early
+        
+    Returns:
+        list: (success, response/error_message) tuples in input order
+    """
+    if batch_id:
+        batch = claude_client.messages.batches.retrieve(batch_id)
+    else:
+        batch = claude_client.messages.batches.create(
+            requests=[
+                {
+                    "custom_id": f"chunk-{i}",
+                    "params": {
+                        "model": model,
+                        "max_tokens": 4000,
+                        "system": _claude_system(system),
+                        "messages": [{"role": "user", "content": query}]
+                    }
+                }
+                for i, query in enumerate(queries)
+            ]
+        )
+        if on_submit:
+            on_submit(batch.id)
+    
+    while batch.processing_status != "ended":
+        if _wait_for_poll(poll_interval, cancel_event):
+            return [(False, f"Stopped waiting for batch {batch.id}")] * len(queries)
+        batch = claude_client.messages.batches.retrieve(batch.id)
+    
+    results = [(False, f"Batch {batch.id} returned no result")] * len(queries)
+    for item in claude_client.messages.batches.results(batch.id):
+        index = int(item.custom_id.split("-", 1)[1])
+        if item.result.type == "succeeded":
+            results[index] = (True, item.result.message.content[0].text)
+        else:
+            results[index] = (False, f"Request {item.result.type}")
+    return results
+
+def get_llm_batch_completion(queries, model="gpt-4o", poll_interval=30, batch_id=None, on_submit=None,
+                             system=None, cancel_event=None):
+    """
+    Unified interface for provider Batch APIs (about half the cost of realtime
+    calls, but results may take minutes to hours).
+    
+    Args:
+        queries (list): List of string queries
+        model (str): Model identifier; must satisfy supports_batch_api
+        poll_interval (int): Seconds to wait between status checks
+        batch_id (str): ID of an already submitted batch for these queries to resume
+        on_submit (callable): Called with the new batch ID once a batch is created,
+            so callers can persist it and resume after a restart
+        system (str): Optional system prompt shared by every query
+        cancel_event (threading.Event): Optional event that stops waiting for
+            the job (which keeps running and can be resumed by its batch ID)
+        
+    Returns:
+        list: (success, response/error_message) tuples in input order
+    """
+    try:
+        if model.startswith("claude"):
+            return get_claude_batch_completion(queries, model, poll_interval, batch_id, on_submit, system,
+                                               cancel_event)
+        elif not supports_batch_api(model):
+            return [(False, f"Model {model} does not support batch processing")] * len(queries)
+        else:
+            return get_openai_batch_completion(queries, model, poll_interval, batch_id, on_submit, system,
+                                               cancel_event)
+    except Exception as e:
+        return [(False, str(e))] * len(queries)
+
+# Image media types by file extension, used when the server sends none
+_IMG_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
+# Total base64 characters of recently fetched images kept in memory
+IMAGE_CACHE_CHARS = 32 * 1024 * 1024
+_image_cache = OrderedDict()  # url -> (media_type, base64_data), least recently used first
+_image_cache_chars = 0
+_image_cache_lock = threading.Lock()
+
+def _cache_image(image_url, result):
+    """Add a fetched image to the in-memory cache, evicting the least recently used beyond IMAGE_CACHE_CHARS."""
+    global _image_cache_chars
+    size = len(result[1])
+    with _image_cache_lock:
+        if size > IMAGE_CACHE_CHARS or image_url in _image_cache:
+            return
+        _image_cache[image_url] = result
+        _image_cache_chars += size
+        while _image_cache_chars > IMAGE_CACHE_CHARS:
+            _, (_, evicted) = _image_cache.popitem(last=False)
+            _image_cache_chars -= len(evicted)
+
+def _fetch_image_base64(image_url):
+    """
+    Download an image over the shared client and base64-encode it. Recent
+    results are cached per URL (up to IMAGE_CACHE_CHARS in total), so
+    analysing the same image again skips the download.
+    
+    Args:
+        image_url (str): URL of the image
+        
+    Returns:
+        tuple: (media_type, base64_data)
+    """
+    with _image_cache_lock:
+        cached = _image_cache.get(image_url)
+        if cached is not None:
+            _image_cache.move_to_end(image_url)
+            return cached
+    
+    response = http_client.get(image_url)
+    response.raise_for_status()
+    media_type = response.headers.get("content-type", "").split(";")[0].strip()
+    if not media_type.startswith("image/"):
+        # Fall back to the file extension
+        ext = os.path.splitext(urlparse(image_url).path)[1].lower()
+        media_type = _IMG_TYPES.get(ext, "image/png")
+    result = (media_type, base64.standard_b64encode(response.content).decode("ascii"))
+    _cache_image(image_url, result)
+    return result
 
 def process_image_claude(image_url, message_text="Describe this image."): 
     """
@@ -163,15 +662,8 @@ def process_image_claude(image_url, message_text="Describe this image."):
         tuple: (success, response/error_message)
     """
     try:
-        # Get image data from URL
-        image_response = httpx.get(image_url)
-        image_response.raise_for_status()
-        
-        # Determine media type from URL
-        media_type = "image/jpeg" if image_url.lower().endswith(('.jpg', '.jpeg')) else "image/png"
-        
-        # Encode image data
-        image_data = base64.standard_b64encode(image_response.content).decode("utf-8")
+        # Get and encode image data from URL
+        media_type, image_data = _fetch_image_base64(image_url)
 
         response = claude_client.messages.create(
             model="claude-3-7-sonnet-latest",